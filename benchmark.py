@@ -0,0 +1,394 @@
+"""
+Offline-Benchmark für das eBay Order Processing Tool (ohne eBay-Zugriffstoken).
+
+Startet einen lokalen Ersatz der eBay Fulfillment API (/sell/fulfillment/v1/order und /order/{id}) mit einstellbarer
+Latenz, Fehlerquote, 429-Verhalten und Bestellanzahl und erzeugt synthetische Arbeitsmappen im Spaltenlayout A–Q.
+Für jede Arbeitsmappengröße wird process_orders gegen den API-Ersatz ausgeführt; ausgegeben werden die Stufen aus
+dessen Laufzeitmessung (RunMetrics), Laufzeit und Spitzenspeicher des Laufs sowie die API-Aufrufe pro Bestellung,
+damit Verschlechterungen beim Abrufen, beim Duplikatabgleich und beim Schreiben der Excel-Datei vor einem Update
+auffallen. Zusätzlich gemessen werden das Erzeugen der Arbeitsmappe und die Ausgabeformate CSV, SQLite und XLSX.
+
+Beispiel:
+    python benchmark.py --orders 2000 --rows 1000 100000 --latency 0.02 --error-rate 0.01 --rate-limit 0.02
+"""
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, urlencode
+
+# Pfad des Hauptskripts (Dateiname mit Leerzeichen, daher Import über importlib)
+TOOL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "eBay Order Processing Tool.py")
+
+# Typische SKUs, damit die SKU-Regeln (NF-Suffix, gleiche/ungleiche Ziffernpaare, unveränderte SKUs) alle greifen
+BENCHMARK_SKUS = ["HLMR1010", "HLMR1012", "DR0808", "DR0810NF", "CL1111", "DBL1012", "WA30H", "XYZ123"]
+BENCHMARK_CITIES = ["Wuppertal", "Köln", "Düsseldorf", "Essen", "Dortmund", "Berlin", "Hamburg", "München"]
+BENCHMARK_SHEET = "Bestellungen"
+
+def load_tool():
+    """Lädt das Hauptskript als Modul"""
+    spec = importlib.util.spec_from_file_location("ebay_order_processing_tool", TOOL_PATH)
+    tool = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(tool)
+    return tool
+
+# Zeitraum (Tage), über den die Bestellungen des API-Ersatzes verteilt werden, innerhalb des Abrufzeitraums von 30 Tagen
+BENCHMARK_ORDER_DAYS = 29
+
+def make_order(index, created):
+    """Erzeugt eine synthetische Bestellung im Format der Fulfillment API (jede 10. storniert, jede 5. mit zwei Artikeln)"""
+    line_items = [{
+        "sku": BENCHMARK_SKUS[index % len(BENCHMARK_SKUS)],
+        "quantity": 1 + index % 3,
+        "discountedLineItemCost": {"value": f"{19.9 + index % 50:.2f}", "currency": "EUR"},
+    }]
+    if index % 5 == 0:
+        line_items.append({"sku": BENCHMARK_SKUS[(index + 3) % len(BENCHMARK_SKUS)], "quantity": 1,
+                           "discountedLineItemCost": {"value": "9.90", "currency": "EUR"}})
+    return {
+        "orderId": f"BENCH-{index:07d}",
+        "creationDate": created.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "lastModifiedDate": (created + timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "orderFulfillmentStatus": "NOT_STARTED",
+        "cancelStatus": {"cancelState": "CANCELED" if index % 10 == 0 else "NONE_REQUESTED"},
+        "buyer": {"username": f"buyer{index}"},
+        "fulfillmentStartInstructions": [{"shippingStep": {"shipTo": {
+            "fullName": f"Käufer {index}",
+            "email": f"buyer{index}@example.com",
+            "primaryPhone": {"phoneNumber": f"0202 {index:07d}"},
+            "contactAddress": {
+                "addressLine1": f"Teststraße {index % 200 + 1}",
+                "addressLine2": "Hinterhaus" if index % 13 == 0 else "",
+                "city": BENCHMARK_CITIES[index % len(BENCHMARK_CITIES)],
+                "postalCode": f"{42000 + index % 1000}",
+            },
+        }}}],
+        "lineItems": line_items,
+    }
+
+class MockFulfillmentApi:
+    """
+    Lokaler HTTP-Ersatz für getOrders (/sell/fulfillment/v1/order, mit limit/offset, next-Link und orderIds)
+    und getOrder (/sell/fulfillment/v1/order/{id}). Der getOrders-Filter nach creationdate bzw. lastmodifieddate
+    wird wie von eBay angewendet, damit Backfill-Zeitfenster und inkrementelle Läufe nur ihre Bestellungen erhalten.
+    latency: Verzögerung pro Anfrage in Sekunden, error_rate: Anteil der Anfragen mit HTTP 500,
+    rate_limit_rate: Anteil der Anfragen mit HTTP 429 und Retry-After (retry_after Sekunden).
+    Die Aufrufe werden in calls gezählt.
+    """
+
+    def __init__(self, order_count, latency=0.0, error_rate=0.0, rate_limit_rate=0.0, retry_after=0.05, seed=1):
+        # Erstellungszeitpunkte gleichmäßig über BENCHMARK_ORDER_DAYS verteilen (UTC, wie die Zeitstempel der API),
+        # mit einem halben Tag Abstand zu den Grenzen des 30-tägigen Abrufzeitraums
+        base_date = (datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+                     - timedelta(days=BENCHMARK_ORDER_DAYS, hours=12))
+        step = timedelta(days=BENCHMARK_ORDER_DAYS) / max(1, order_count)
+        self.orders = [make_order(i, base_date + step * i) for i in range(order_count)]
+        self.orders_by_id = {order["orderId"]: order for order in self.orders}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.reset_calls()
+        self.server = None
+        self.url = None
+
+    def reset_calls(self):
+        with self.lock:
+            self.calls = {"list": 0, "detail": 0, "429": 0, "500": 0, "bytes": 0}
+
+    def _count(self, key, amount=1):
+        with self.lock:
+            self.calls[key] += amount
+
+    def _roll(self):
+        """Bestimmt zufällig, ob die Anfrage mit 429 oder 500 beantwortet wird"""
+        with self.lock:
+            value = self.random.random()
+        if value < self.rate_limit_rate:
+            return 429
+        if value < self.rate_limit_rate + self.error_rate:
+            return 500
+        return 200
+
+    @staticmethod
+    def filter_orders(orders, filter_str):
+        """
+        Wendet einen getOrders-Filter wie creationdate:[von..bis] oder lastmodifieddate:[von..] an (Grenzen einschließlich).
+        Die Zeitstempel haben dasselbe ISO-Format wie die Bestellungen und werden als Zeichenketten verglichen.
+        """
+        fields = {"creationdate": "creationDate", "lastmodifieddate": "lastModifiedDate"}
+        for condition in filter(None, filter_str.split(",")):
+            name, _, value = condition.partition(":")
+            field = fields.get(name.strip().lower())
+            if field is None:
+                continue
+            start, _, end = value.strip().strip("[]").partition("..")
+            orders = [order for order in orders
+                      if (not start or order[field] >= start) and (not end or order[field] <= end)]
+        return orders
+
+    def handle(self, handler):
+        """Beantwortet eine GET-Anfrage, gibt (Statuscode, Header, Körper) zurück"""
+        if self.latency:
+            time.sleep(self.latency)
+        parsed = urlparse(handler.path)
+        parts = parsed.path.rstrip("/").split("/")
+        is_list = parts[-1] == "order"
+        self._count("list" if is_list else "detail")
+
+        status = self._roll()
+        if status == 429:
+            self._count("429")
+            return 429, {"Retry-After": str(self.retry_after)}, b""
+        if status == 500:
+            self._count("500")
+            return 500, {}, b""
+
+        if is_list:
+            query = parse_qs(parsed.query)
+            orders = self.orders
+            if "orderIds" in query:
+                wanted = query["orderIds"][0].split(",")
+                orders = [self.orders_by_id[order_id] for order_id in wanted if order_id in self.orders_by_id]
+            elif "filter" in query:
+                orders = self.filter_orders(orders, query["filter"][0])
+            limit = int(query.get("limit", ["50"])[0])
+            offset = int(query.get("offset", ["0"])[0])
+            body = {"orders": orders[offset:offset + limit], "total": len(orders), "limit": limit, "offset": offset}
+            if offset + limit < len(orders) and "orderIds" not in query:
+                next_query = {"filter": query["filter"][0]} if "filter" in query else {}
+                body["next"] = f"{self.url}?{urlencode({**next_query, 'limit': limit, 'offset': offset + limit})}"
+        else:
+            body = self.orders_by_id.get(parts[-1])
+            if body is None:
+                return 404, {}, b""
+        data = json.dumps(body).encode("utf-8")
+        self._count("bytes", len(data))
+        return 200, {"Content-Type": "application/json"}, data
+
+    def start(self):
+        """Startet den Server in einem Hintergrundthread und gibt die URL von getOrders zurück"""
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, headers, data = api.handle(self)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/sell/fulfillment/v1/order"
+        return self.url
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+def generate_workbook(path, rows, overlap_orders=(), sheet_name=BENCHMARK_SHEET):
+    """
+    Erzeugt eine synthetische Arbeitsmappe mit Kopfzeile und rows Datenzeilen im Spaltenlayout A–Q.
+    Die Bestellnummern aus overlap_orders stehen am Ende der Tabelle, damit der Duplikatabgleich Treffer findet.
+    Die Arbeitsmappe wird im write_only-Modus geschrieben, damit auch 1 Mio. Zeilen wenig Speicher benötigen.
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    sheet.append(["Datum", "Plattform", "Menge", "Preis", "Artikelnummer", "Standort", "Verkaufsplattform",
+                  "Bestellnummer", None, "Käufername", "E-Mail", "Telefon", "Versand", "Empfänger", "Straße", "PLZ",
+                  "Stadt"])
+    overlap_orders = list(overlap_orders)[:rows]
+    base_date = datetime(2020, 1, 1)
+    for i in range(rows - len(overlap_orders)):
+        sheet.append((base_date + timedelta(minutes=i), 'Ebay', 1 + i % 3, 19.9, BENCHMARK_SKUS[i % len(BENCHMARK_SKUS)],
+                      'Wuppertal', 'Ebay', f"HIST-{i:07d}", None, f"buyer{i}", f"buyer{i}@example.com",
+                      f"0202 {i:07d}", 'Versand', f"Käufer {i}", f"Teststraße {i % 200 + 1}", f"{42000 + i % 1000}",
+                      BENCHMARK_CITIES[i % len(BENCHMARK_CITIES)]))
+    for order in overlap_orders:
+        sheet.append((base_date, 'Ebay', 1, 19.9, order["lineItems"][0]["sku"], 'Wuppertal', 'Ebay', order["orderId"],
+                      None, order["buyer"]["username"], None, None, 'Versand', None, None, None, None))
+    workbook.save(path)
+
+class StageTimer:
+    """Misst Laufzeit und (optional) Spitzenspeicher einzelner Stufen und sammelt die Ergebnisse"""
+
+    def __init__(self, track_memory=True):
+        self.track_memory = track_memory
+        self.results = []
+        # Ausgabestrom beim Erstellen merken, da die Konsolenausgaben des Hauptskripts während der Messung umgeleitet sind
+        self.out = sys.stdout
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        if self.track_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024) if self.track_memory else None
+            self.results.append({"stage": name, "seconds": round(seconds, 4),
+                                 "peak_mb": round(peak_mb, 1) if peak_mb is not None else None})
+            peak = f"{peak_mb:8.1f} MB" if peak_mb is not None else "       -"
+            print(f"  {name:<36} {seconds:9.3f} s {peak}", file=self.out, flush=True)
+
+def api_calls_per_order(api, order_count):
+    """Fasst die Zähler des API-Ersatzes pro Bestellung zusammen"""
+    calls = dict(api.calls)
+    total = calls["list"] + calls["detail"]
+    return {**calls, "total": total, "per_order": round(total / order_count, 3) if order_count else None}
+
+def pipeline_stages(tool, metrics):
+    """Ordnet die Stufen aus den RunMetrics von process_orders in Verarbeitungsreihenfolge mit ihrer Bezeichnung an"""
+    stages = metrics["stages"]
+    names = [name for name in tool.STAGE_LABELS if name in stages] + [name for name in stages if name not in tool.STAGE_LABELS]
+    return [{"stage": name, "label": tool.STAGE_LABELS.get(name, name), "seconds": stages[name]} for name in names]
+
+def run_process_orders(tool, timer, label, metrics_path, **kwargs):
+    """
+    Führt process_orders als Stufe label des StageTimers aus (Gesamtlaufzeit und Spitzenspeicher) und gibt die
+    exportierten RunMetrics des Laufs zurück.
+    """
+    # Ausgaben des Hauptskripts (Bestelllisten, Fortschritt) unterdrücken, damit sie die Messung nicht verfälschen
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), timer.stage(label):
+        success = tool.process_orders("benchmark", "30", "0", log=lambda text: None, metrics_json_file=metrics_path,
+                                      **kwargs)
+    with open(metrics_path, encoding='utf-8') as f:
+        metrics = json.load(f)
+    if not success:
+        print(f"  {label}: Lauf nicht erfolgreich abgeschlossen", file=timer.out)
+    return metrics
+
+def run_benchmark(tool, api, rows, work_dir, args):
+    """
+    Führt für eine Arbeitsmappengröße einen vollständigen Lauf von process_orders gegen den API-Ersatz aus und gibt die
+    Messergebnisse zurück: die Stufen aus den RunMetrics des Laufs, zusätzlich die Erzeugung der Arbeitsmappe und den
+    Vergleich der Ausgabeformate (CSV, SQLite, XLSX) mit denselben Bestellungen.
+    """
+    print(f"\n=== Arbeitsmappe mit {rows} Zeilen, {len(api.orders)} Bestellungen ===")
+    timer = StageTimer(track_memory=not args.no_memory)
+    excel_path = os.path.join(work_dir, f"benchmark_{rows}.xlsx")
+    overlap = api.orders[:int(len(api.orders) * args.overlap)]
+
+    with timer.stage("Arbeitsmappe erzeugen"):
+        generate_workbook(excel_path, rows, overlap)
+
+    # Verbindung und Zwischenspeicher werden übergeben und über alle Läufe dieser Arbeitsmappengröße wiederverwendet;
+    # der erste Lauf ruft alle Bestellungen ab, die Ausgabeformate werden danach aus dem Zwischenspeicher beliefert
+    session = tool.ApiSession("benchmark", args.workers, args.requests_per_second, args.max_retries)
+    cache = tool.ResponseCache(os.path.join(work_dir, f"response_cache_{rows}.sqlite"))
+    options = {"max_workers": str(args.workers), "session": session, "cache": cache, "sku_rules": tool.SkuRules(),
+               "summary_only": args.summary_only, "use_order_index": not args.no_order_index,
+               "backfill_window_days": args.backfill or 0}
+    try:
+        api.reset_calls()
+        metrics = run_process_orders(tool, timer, "Verarbeitungslauf (process_orders)",
+                                     os.path.join(work_dir, f"metrics_{rows}.json"), excel_path=excel_path,
+                                     worksheet_name=BENCHMARK_SHEET, **options)
+        calls = api_calls_per_order(api, metrics["counters"].get("orders", 0))
+        calls["retries"] = metrics["counters"].get("retries", 0)
+        stages = pipeline_stages(tool, metrics)
+        for stage in stages:
+            print(f"    {stage['label']:<34} {stage['seconds']:9.3f} s")
+
+        # Ausgabeformate ohne Abgleich mit der Arbeitsmappe, damit jedes Format alle neuen Bestellungen schreibt
+        outputs = []
+        for label, extension in (("CSV-Ausgabe", ".csv"), ("SQLite-Ausgabe", ".sqlite"), ("XLSX-Ausgabe (write_only)", ".xlsx")):
+            output_metrics = run_process_orders(tool, timer, label, os.path.join(work_dir, f"metrics_{rows}{extension}.json"),
+                                                excel_path="", worksheet_name="",
+                                                output_path=os.path.join(work_dir, f"benchmark_{rows}_output{extension}"),
+                                                **options)
+            outputs.append({"output": label, "rows_written": output_metrics["counters"].get("rows_written", 0),
+                            "stages": pipeline_stages(tool, output_metrics)})
+    finally:
+        cache.close()
+        session.close()
+
+    counters = metrics["counters"]
+    print(f"  Bestellungen: {counters.get('orders', 0)}, Bestellzeilen: {counters.get('order_lines', 0)}, "
+          f"neue Zeilen: {counters.get('rows_written', 0)}")
+    print(f"  API-Aufrufe: {calls['list']} getOrders, {calls['detail']} getOrder, {calls['429']} x 429, "
+          f"{calls['500']} x 500, {calls['retries']} Wiederholungen, {calls['per_order']} pro Bestellung, {calls['bytes'] / 1024:.0f} KB")
+    if not args.keep:
+        os.remove(excel_path)
+    return {"rows": rows, "orders": counters.get("orders", 0), "lines_written": counters.get("rows_written", 0),
+            "api_calls": calls, "run_seconds": metrics["total_seconds"], "pipeline_stages": stages,
+            "stages": timer.results, "outputs": outputs}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline-Benchmark mit lokalem API-Ersatz und synthetischen Arbeitsmappen")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000, 1000000],
+                        help="Zeilenanzahl der synthetischen Arbeitsmappen (Standard: 1000 100000 1000000)")
+    parser.add_argument("--orders", type=int, default=1000, help="Anzahl der Bestellungen im API-Ersatz")
+    parser.add_argument("--overlap", type=float, default=0.5,
+                        help="Anteil der Bestellungen, die bereits in der Arbeitsmappe stehen (Standard: 0.5)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latenz pro API-Anfrage in Sekunden")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Anteil der Anfragen mit HTTP 500")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Anteil der Anfragen mit HTTP 429")
+    parser.add_argument("--retry-after", type=float, default=0.05, help="Retry-After der 429-Antworten in Sekunden")
+    parser.add_argument("--workers", type=int, default=8, help="Gleichzeitige getOrder-Anfragen")
+    parser.add_argument("--requests-per-second", type=float, default=1000, help="Clientseitige Ratenbegrenzung")
+    parser.add_argument("--max-retries", type=int, default=5, help="Wiederholungsversuche bei 429/5xx")
+    parser.add_argument("--summary-only", action="store_true", help="Bestelldaten aus der Bestellliste übernehmen")
+    parser.add_argument("--backfill", type=int, metavar="DAYS",
+                        help="Abrufzeitraum in Zeitfenster dieser Länge (Tage) aufteilen, wie --backfill des Hauptskripts")
+    parser.add_argument("--no-order-index", action="store_true",
+                        help="Duplikatabgleich ohne Bestellindex (Spalte H der Arbeitsmappe lesen)")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Spitzenspeicher nicht messen (tracemalloc verlangsamt openpyxl deutlich)")
+    parser.add_argument("--keep", action="store_true", help="Erzeugte Arbeitsmappen nicht löschen")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON in diese Datei schreiben")
+    args = parser.parse_args(argv)
+
+    tool = load_tool()
+    api = MockFulfillmentApi(args.orders, args.latency, args.error_rate, args.rate_limit, args.retry_after)
+    tool.URL_GET_ORDERS = api.start()
+    work_dir = tempfile.mkdtemp(prefix="ebay_benchmark_")
+    # Bestellindex, Laufjournal und Ausgabeindex im Arbeitsverzeichnis statt im Anwendungsdatenverzeichnis anlegen
+    tool.get_data_dir = lambda: work_dir
+    if not args.no_memory:
+        tracemalloc.start()
+    try:
+        results = [run_benchmark(tool, api, rows, work_dir, args) for rows in args.rows]
+    finally:
+        api.stop()
+        if not args.no_memory:
+            tracemalloc.stop()
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        else:
+            print(f"\nArbeitsmappen unter {work_dir}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"settings": vars(args), "results": results}, f, ensure_ascii=False, indent=4)
+        print(f"\nErgebnisse gespeichert: {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,64 @@
-import requests
-import openpyxl
+# requests, openpyxl und tkinter werden erst bei Bedarf importiert, damit der Kommandozeilenmodus
+# ohne tkinter auskommt und z.B. --help sofort antwortet
 from datetime import datetime, timezone, timedelta
-import tkinter as tk
-from tkinter import filedialog, ttk
 import json
 import os
 import platformdirs
+import queue
+import random
+import hashlib
+import heapq
+import itertools
+import contextlib
+import pickle
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from operator import attrgetter
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+# Standardwerte der Informationsanzeige: maximale Zeilenanzahl, Meldungen pro Aktualisierung und Aktualisierungsintervall
+DEFAULT_LOG_MAX_LINES = 1000
+LOG_BATCH_SIZE = 500
+LOG_POLL_MS = 100
+
+class LogView:
+    """
+    Informationsanzeige als Ringpuffer: Es werden höchstens max_lines Zeilen angezeigt, ältere Zeilen werden entfernt.
+    Optional werden alle Meldungen zusätzlich an eine Logdatei angehängt, damit entfernte Zeilen erhalten bleiben.
+    """
 
-#Definiere eine Klasse, die bei leerem Eingabefeld einen grauen Platzhaltertext anzeigt. Wenn das Eingabefeld den Fokus erh lt, verschwindet der Platzhaltertext. Wenn das Eingabefeld den Fokus verliert und leer ist, erscheint der Platzhaltertext wieder.
-class PlaceholderEntry(ttk.Entry):
-    """Eingabefeld mit grauem Platzhaltertext, der bei Fokus verschwindet."""
-    
-    def __init__(self, container, placeholder, *args, **kwargs):
-        super().__init__(container, *args, **kwargs, style='Placeholder.TEntry')
-        self.placeholder = placeholder
-        self.insert('0', self.placeholder)
-        self.bind('<FocusIn>', self._clear_placeholder)
-        self.bind('<FocusOut>', self._add_placeholder)
-        self.configure(foreground='grey')
-
-    def _clear_placeholder(self, e):
-        """Entfernt den Platzhalter bei Fokus."""
-        if self.get() == self.placeholder:
-            self.delete('0', 'end')
-            self.configure(foreground='white')
-
-    def _add_placeholder(self, e):
-        """Fügt den Platzhalter wieder ein, wenn das Feld leer ist."""
-        if not self.get():
-            self.insert('0', self.placeholder)
-            self.configure(foreground='grey')
-    
-    def get_value(self):
-        """Gibt den aktuellen Wert zurück (leerer String falls nur Platzhalter)."""
-        return '' if self.get() == self.placeholder else self.get()
+    def __init__(self, text_widget, max_lines=DEFAULT_LOG_MAX_LINES, log_file=None):
+        self.text_widget = text_widget
+        self.max_lines = max_lines
+        self.log_file = log_file
+
+    def append(self, text):
+        """Fügt Text am Ende an und entfernt die ältesten Zeilen, sobald die maximale Zeilenanzahl überschritten ist."""
+        self.text_widget.insert("end", text)
+        line_count = int(self.text_widget.index("end-1c").split(".")[0])
+        if line_count > self.max_lines:
+            self.text_widget.delete("1.0", f"{line_count - self.max_lines + 1}.0")
+        self.text_widget.see("end")
+        if self.log_file:
+            try:
+                with open(self.log_file, 'a', encoding='utf-8') as f:
+                    f.write(text)
+            except OSError as e:
+                print(f"Fehler beim Schreiben der Logdatei: {e}")
+
+    def clear(self):
+        """Leert die Anzeige (die Logdatei bleibt erhalten)."""
+        self.text_widget.delete("1.0", "end")
+
+# Datenverzeichnis der Anwendung
+def get_data_dir():
+    """Gibt das plattformspezifische Anwendungsdatenverzeichnis zurück (wird bei Bedarf erstellt)"""
+    app_author = "MeinUnternehmen"
+    return platformdirs.user_data_dir("EbayTools", app_author, ensure_exists=True)
 
 # Konfigurationsdateipfad
 def get_config_file_path():
@@ -43,10 +68,9 @@ def get_config_file_path():
     """
     # Skriptname ohne Dateiendung extrahieren
     script_name = os.path.splitext(os.path.basename(__file__))[0]
-    app_author = "MeinUnternehmen"
     
     # Plattformspezifisches Anwendungsdatenverzeichnis abrufen
-    data_dir = platformdirs.user_data_dir("EbayTools", app_author, ensure_exists=True)
+    data_dir = get_data_dir()
     
     # Konfigurationsdateinamen erstellen
     config_file = f"{script_name}.json"
@@ -84,6 +108,1871 @@ def save_config(config):
     except Exception as e:
         print(f"Fehler beim Speichern der Konfiguration: {e}")
 
+def config_number(config, key, default, type_=int):
+    """Liest einen Zahlenwert aus der Konfiguration, bei fehlendem oder ungültigem Wert wird der Standardwert verwendet"""
+    value = config.get(key)
+    if value in (None, ""):
+        return default
+    try:
+        return type_(value)
+    except (TypeError, ValueError):
+        print(f"Ungültiger Wert für {key} in der Konfiguration: {value}")
+        return default
+
+# Verarbeitungsstufen der Laufzeitmessung mit ihrer Bezeichnung in der Informationsanzeige
+STAGE_LABELS = {
+    "list_fetch": "Bestellliste (getOrders)",
+    "detail_fetch": "Bestelldetails (getOrder)",
+    "parse": "Bestellzeilen erzeugen",
+    "filter": "Storno-Filter",
+    "sort": "Sortierung",
+    "sku": "SKU-Regeln",
+    "dedup": "Duplikatabgleich",
+    "aggregates": "Verkaufssummen",
+    "excel_load": "Excel laden",
+    "excel_write": "Excel schreiben",
+    "excel_save": "Excel speichern",
+    "output": "Ausgabe schreiben",
+}
+
+# Präfix der Metriknamen im Prometheus-Textfile-Export
+METRICS_PREFIX = "ebay_order_tool"
+
+class RunMetrics:
+    """
+    Laufzeit- und Mengenmessung eines Verarbeitungslaufs.
+    stage() misst die Wandzeit einer Stufe, count() zählt Mengen wie Anfragen, Wiederholungen, empfangene Bytes oder
+    geschriebene Zeilen. Als Wandzeit einer Stufe zählt die Zeit, in der mindestens ein Thread in ihr arbeitet;
+    gleichzeitige Messungen mehrerer Threads (parallele Konten bzw. Zeitfenster) werden damit nicht addiert.
+    Verschachtelte Messungen (z.B. die Generatoren der Verarbeitungskette, die erst beim Schreiben durchlaufen werden)
+    zählen nur einmal: solange eine innere Stufe läuft, ruht die äußere Stufe im selben Thread.
+    Die Ergebnisse können als Zusammenfassung, als JSON oder als Prometheus-Textfile ausgegeben werden.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.success = None
+        self._lock = threading.Lock()
+        # Anzahl der Threads, die gerade in einer Stufe arbeiten, und Beginn des laufenden Zeitraums pro Stufe
+        self._active = {}
+        self._active_since = {}
+        # Verschachtelte Stufen des jeweiligen Threads (die innerste zuletzt)
+        self._local = threading.local()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        nested = self._local.__dict__.setdefault("stages", [])
+        if nested:
+            self._leave(nested[-1])
+        nested.append(name)
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._leave(name)
+            nested.pop()
+            if nested:
+                self._enter(nested[-1])
+
+    def _enter(self, name):
+        with self._lock:
+            if not self._active.get(name):
+                self._active_since[name] = time.perf_counter()
+            self._active[name] = self._active.get(name, 0) + 1
+
+    def _leave(self, name):
+        with self._lock:
+            self._active[name] -= 1
+            if not self._active[name]:
+                self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - self._active_since[name]
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def timed_iter(self, name, iterable):
+        """Misst die Wartezeit auf jedes Element eines Iterators (z.B. die Seiten der Bestellliste) als Stufe name"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def total_seconds(self):
+        return time.perf_counter() - self._started
+
+    def summary_lines(self):
+        """Zusammenfassung für die Informationsanzeige"""
+        # Stufen in der Reihenfolge der Verarbeitung anzeigen
+        names = [name for name in STAGE_LABELS if name in self.stages]
+        names += [name for name in self.stages if name not in STAGE_LABELS]
+        lines = [f"{STAGE_LABELS.get(name, name)}: {self.stages[name]:.2f} s" for name in names]
+        lines.append(f"Gesamt: {self.total_seconds():.2f} s")
+        counters = self.counters
+        lines.append(f"API-Anfragen: {counters.get('requests', 0)} (Wiederholungen: {counters.get('retries', 0)}, "
+                     f"empfangen: {counters.get('bytes_received', 0) / 1024:.0f} KB)")
+        lines.append(f"Geschriebene Zeilen: {counters.get('rows_written', 0)}")
+        if counters.get("rows_updated"):
+            lines.append(f"Aktualisierte Zeilen (Status): {counters['rows_updated']}")
+        return lines
+
+    def as_dict(self):
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "success": self.success,
+            "total_seconds": round(self.total_seconds(), 4),
+            "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+    def prometheus_text(self):
+        """Metriken im Prometheus-Textformat (für den textfile-Collector des node_exporter)"""
+        lines = [
+            f"# HELP {METRICS_PREFIX}_stage_seconds Wandzeit pro Verarbeitungsstufe des letzten Laufs",
+            f"# TYPE {METRICS_PREFIX}_stage_seconds gauge",
+        ]
+        lines += [f'{METRICS_PREFIX}_stage_seconds{{stage="{name}"}} {seconds:.6f}' for name, seconds in self.stages.items()]
+        values = {
+            **self.counters,
+            "run_seconds": round(self.total_seconds(), 6),
+            "last_run_success": int(bool(self.success)),
+            "last_run_timestamp_seconds": int(self.started_at.timestamp()),
+        }
+        for name, value in values.items():
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name} gauge")
+            lines.append(f"{METRICS_PREFIX}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, json_path=None, prometheus_path=None):
+        """
+        Schreibt die Metriken als JSON bzw. Prometheus-Textfile. Die Dateien werden erst vollständig in eine
+        temporäre Datei geschrieben und dann ersetzt, damit ein Scraper nie eine halbe Datei liest.
+        """
+        for path, content in ((json_path, lambda: json.dumps(self.as_dict(), ensure_ascii=False, indent=4)),
+                              (prometheus_path, self.prometheus_text)):
+            if not path:
+                continue
+            temp_path = f"{path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(content())
+            os.replace(temp_path, path)
+
+# API-Endpunkt der eBay Fulfillment API für Bestellungen
+URL_GET_ORDERS = "https://api.ebay.com/sell/fulfillment/v1/order"
+
+# Standardanzahl gleichzeitiger getOrder-Anfragen
+DEFAULT_MAX_WORKERS = 8
+
+# Konfigurationsschlüssel und Sicherheitsüberlappung für die inkrementelle Synchronisierung
+WATERMARK_KEY = "last_modified_watermark"
+DEFAULT_WATERMARK_OVERLAP_MINUTES = 10
+
+# Synchronisierungsstand pro Kontoprofil (Name -> lastModifiedDate)
+ACCOUNT_WATERMARKS_KEY = "account_watermarks"
+
+# Standort in Spalte F, wenn ein Konto keinen eigenen Standort angibt
+DEFAULT_LOCATION = "Wuppertal"
+
+def load_accounts(config, names=None):
+    """
+    Liest die Kontoprofile aus der Konfiguration ("accounts": Liste mit name, token bzw. token_file oder token_env,
+    marketplace und location). Mit names werden nur die genannten Konten verwendet.
+    Profile ohne Token werden mit einer Meldung übersprungen.
+    """
+    accounts = []
+    for number, profile in enumerate(config.get("accounts") or [], 1):
+        name = profile.get("name") or f"Konto {number}"
+        if names and name not in names:
+            continue
+        token = profile.get("token") or ""
+        try:
+            if not token and profile.get("token_file"):
+                with open(profile["token_file"], 'r', encoding='utf-8') as f:
+                    token = f.read()
+        except OSError as e:
+            print(f"Fehler beim Lesen des Tokens für {name}: {e}")
+        if not token and profile.get("token_env"):
+            token = os.environ.get(profile["token_env"], "")
+        if not token.strip():
+            print(f"Kein Zugriffstoken für {name}, Konto wird übersprungen")
+            continue
+        accounts.append({
+            "name": name,
+            "token": token.strip(),
+            "marketplace": profile.get("marketplace"),
+            "location": profile.get("location") or DEFAULT_LOCATION,
+        })
+    return accounts
+
+# Maximale Seitengröße (limit) von getOrders laut eBay-Dokumentation
+MAX_PAGE_SIZE = 1000
+
+# Standardwerte für Wiederholungsversuche und clientseitige Ratenbegrenzung
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_BASE = 0.5  # Sekunden vor dem ersten Wiederholungsversuch
+DEFAULT_BACKOFF_MAX = 30.0  # Maximale Wartezeit zwischen zwei Versuchen ohne Retry-After
+RETRY_AFTER_MAX = 900.0  # Sicherheitsgrenze für vom Server per Retry-After verlangte Wartezeiten
+DEFAULT_TIMEOUT = (10, 60)  # Zeitlimit in Sekunden für Verbindungsaufbau und Lesen der Antwort
+DEFAULT_REQUESTS_PER_SECOND = 10
+
+# HTTP-Statuscodes, bei denen eine Anfrage wiederholt wird
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class ApiError(Exception):
+    """Fehler bei einer Anfrage an die eBay API, enthält den HTTP-Statuscode bzw. die Fehlermeldung."""
+
+    def __init__(self, status_code):
+        super().__init__(f"Statuscode: {status_code}")
+        self.status_code = status_code
+
+class TokenBucket:
+    """
+    Clientseitige Ratenbegrenzung nach dem Token-Bucket-Verfahren (thread-sicher).
+    Es werden höchstens rate Anfragen pro Sekunde freigegeben, kurze Spitzen bis capacity sind erlaubt.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Wartet, bis ein Token verfügbar ist, und verbraucht es."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class ApiSession:
+    """
+    Gemeinsame HTTP-Verbindung zur eBay API für alle Anfragen eines Laufs.
+    Verwendet eine requests.Session mit Keep-Alive und einem Verbindungspool passend zur Anzahl paralleler Anfragen,
+    wiederholt Anfragen bei 429/5xx, Verbindungsfehlern und Zeitüberschreitungen (timeout: Verbindungsaufbau, Lesen)
+    mit exponentiellem Backoff und Jitter (unter Beachtung von Retry-After)
+    und begrenzt die Anzahl der Anfragen pro Sekunde über einen Token-Bucket.
+    """
+
+    def __init__(self, token, max_workers=DEFAULT_MAX_WORKERS, requests_per_second=DEFAULT_REQUESTS_PER_SECOND,
+                 max_retries=DEFAULT_MAX_RETRIES, marketplace=None, timeout=DEFAULT_TIMEOUT, list_streams=1):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Content-Type": "application/json"
+        })
+        if marketplace:
+            self.session.headers["X-EBAY-C-MARKETPLACE-ID"] = marketplace
+        # Verbindungspool so groß wie die Anzahl gleichzeitiger Anfragen: max_workers getOrder-Anfragen plus je eine zum
+        # Vorladen der Bestellliste für list_streams gleichzeitig abgerufene Bestelllisten (Zeitfenster im Backfill).
+        # Wiederholungen übernimmt get() selbst
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers + max(1, list_streams), max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.rate_limiter = TokenBucket(requests_per_second)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        # Zähler für die Laufzeitmessung (alle Versuche, davon Wiederholungen, empfangene Bytes)
+        self.stats = {"requests": 0, "retries": 0, "bytes_received": 0}
+        self._stats_lock = threading.Lock()
+
+    def get(self, url, params=None):
+        """
+        Sendet eine GET-Anfrage und wiederholt sie bei vorübergehenden Fehlern.
+        Gibt die letzte Antwort zurück, löst requests.RequestException aus, wenn auch der letzte Versuch keine Antwort liefert.
+        """
+        import requests
+
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            self._count("requests")
+            if attempt:
+                self._count("retries")
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+            self._count("bytes_received", len(response.content))
+            if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                return response
+            delay = self._retry_after(response)
+            time.sleep(delay if delay is not None else self._backoff(attempt))
+        return response
+
+    def close(self):
+        """Schließt alle Verbindungen des Pools."""
+        self.session.close()
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    @staticmethod
+    def _backoff(attempt):
+        """Exponentielle Wartezeit mit vollem Jitter für den angegebenen Versuch."""
+        return random.uniform(0, min(DEFAULT_BACKOFF_MAX, DEFAULT_BACKOFF_BASE * 2 ** attempt))
+
+    @staticmethod
+    def _retry_after(response):
+        """
+        Liest den Retry-After-Header (Sekunden oder HTTP-Datum) und gibt die Wartezeit in Sekunden zurück.
+        Die Wartezeit des Servers wird eingehalten, nur unplausibel lange Angaben werden auf RETRY_AFTER_MAX begrenzt.
+        """
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return min(RETRY_AFTER_MAX, max(0.0, float(value)))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return min(RETRY_AFTER_MAX, max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds()))
+
+# Maximale Anzahl von Bestellnummern pro getOrders-Anfrage mit dem orderIds-Filter
+MAX_ORDER_IDS_PER_REQUEST = 50
+
+def fetch_order_list_page(session, url, params):
+    """Ruft eine Seite der Bestellliste (getOrders) ab und gibt die JSON-Antwort zurück, löst bei Fehlern ApiError aus."""
+    import requests
+
+    try:
+        response = session.get(url, params=params)
+    except requests.RequestException as e:
+        raise ApiError(str(e))
+    if response.status_code != 200:
+        raise ApiError(response.status_code)
+    return response.json()
+
+def build_incremental_filter(watermark, overlap_minutes=DEFAULT_WATERMARK_OVERLAP_MINUTES):
+    """
+    Erstellt den getOrders-Filter für die inkrementelle Synchronisierung: alle Bestellungen, die seit dem
+    gespeicherten lastModifiedDate (abzüglich einer Sicherheitsüberlappung) geändert wurden.
+    """
+    since = datetime.fromisoformat(watermark.replace("Z", "+00:00")) - timedelta(minutes=overlap_minutes)
+    return f"lastmodifieddate:[{since.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')}..]"
+
+def build_time_windows(start, end, window_days):
+    """Teilt den Zeitraum von start bis end in aufeinanderfolgende Zeitfenster von window_days Tagen auf"""
+    windows = []
+    window_start = start
+    while window_start < end:
+        window_end = min(window_start + timedelta(days=window_days), end)
+        windows.append((window_start, window_end))
+        window_start = window_end
+    return windows
+
+def build_creation_date_filter(start, end):
+    """Erstellt den getOrders-Filter für Bestellungen, die zwischen start und end erstellt wurden"""
+    return f"creationdate:[{start.strftime('%Y-%m-%dT%H:%M:%S.000Z')}..{end.strftime('%Y-%m-%dT%H:%M:%S.000Z')}]"
+
+# Standardlänge der Zeitfenster (Tage) und Anzahl gleichzeitig abgerufener Zeitfenster pro Konto im Backfill-Modus
+DEFAULT_BACKFILL_WINDOW_DAYS = 7
+DEFAULT_BACKFILL_PARALLEL = 4
+
+def iter_order_pages(session, filter_str, orders_limit=0, page_size=MAX_PAGE_SIZE):
+    """
+    Ruft die Bestellliste (getOrders) seitenweise ab und liefert jede Seite als Liste von Bestellungen (Generator).
+    Folgt dem next-Link bzw. offset der Antwort, bis alle Bestellungen abgerufen sind oder orders_limit erreicht ist (0 = unbegrenzt).
+    Die nächste Seite wird bereits im Hintergrund geladen, während die aktuelle Seite verarbeitet wird.
+    Löst ApiError aus, wenn eine Seite nicht abgerufen werden kann.
+    """
+    if orders_limit:
+        page_size = min(page_size, orders_limit)
+
+    remaining = orders_limit
+    offset = 0
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(fetch_order_list_page, session, URL_GET_ORDERS, {"filter": filter_str, "limit": page_size, "offset": offset})
+        while future is not None:
+            page = future.result()
+            orders = page.get("orders", [])
+            offset += len(orders)
+            if orders_limit:
+                orders = orders[:remaining]
+                remaining -= len(orders)
+
+            # Nächste Seite anfordern, bevor die aktuelle Seite an den Aufrufer übergeben wird
+            future = None
+            if orders and (not orders_limit or remaining > 0):
+                if page.get("next"):
+                    future = executor.submit(fetch_order_list_page, session, page["next"], None)
+                elif offset < page.get("total", 0):
+                    future = executor.submit(fetch_order_list_page, session, URL_GET_ORDERS, {"filter": filter_str, "limit": page_size, "offset": offset})
+            yield orders
+
+def iter_orders_by_ids(session, order_ids, chunk_size=MAX_ORDER_IDS_PER_REQUEST):
+    """
+    Ruft bestimmte Bestellungen über den orderIds-Filter von getOrders in Blöcken von bis zu 50 Bestellnummern ab
+    und liefert die Bestellungen jedes Blocks als Liste (Generator).
+    Wie bei iter_order_pages wird der nächste Block bereits im Hintergrund geladen.
+    Löst ApiError aus, wenn ein Block nicht abgerufen werden kann.
+    """
+    def fetch_chunk(chunk):
+        return fetch_order_list_page(session, URL_GET_ORDERS, {"orderIds": ",".join(chunk)}).get("orders", [])
+
+    chunks = [order_ids[i:i + chunk_size] for i in range(0, len(order_ids), chunk_size)]
+    if not chunks:
+        return
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(fetch_chunk, chunks[0])
+        for next_chunk in chunks[1:] + [None]:
+            current = future
+            # Nächsten Block anfordern, bevor der aktuelle Block an den Aufrufer übergeben wird
+            future = executor.submit(fetch_chunk, next_chunk) if next_chunk else None
+            yield current.result()
+
+def parse_order_ids(text):
+    """Zerlegt eine durch Kommas, Leerzeichen oder Zeilenumbrüche getrennte Liste von Bestellnummern (ohne Duplikate)."""
+    return list(dict.fromkeys(text.replace(",", " ").split()))
+
+# Statuscode-Ersatz für Bestellungen, deren Abruf wegen eines Abbruchs übersprungen wurde
+CANCELLED_STATUS = "abgebrochen"
+
+def fetch_order_details(order_ids, session, max_workers=DEFAULT_MAX_WORKERS, is_cancelled=lambda: False):
+    """
+    Ruft die Bestelldetails (getOrder) für mehrere Bestellungen gleichzeitig ab.
+    Die Anzahl paralleler Anfragen ist auf max_workers begrenzt. Nach einem Abbruch (is_cancelled) werden die noch
+    ausstehenden Bestellungen nicht mehr abgerufen, sondern mit dem Status CANCELLED_STATUS zurückgegeben.
+    Gibt eine Liste von Tupeln (order_id, status_code, order_details) in derselben Reihenfolge wie order_ids zurück.
+    Bei einem Fehler ist order_details None und status_code enthält den HTTP-Statuscode bzw. die Fehlermeldung.
+    """
+    import requests
+
+    def fetch(order_id):
+        if is_cancelled():
+            return order_id, CANCELLED_STATUS, None
+        url_get_order = f"{URL_GET_ORDERS}/{order_id}"
+        try:
+            response_get_order = session.get(url_get_order)
+        except requests.RequestException as e:
+            return order_id, str(e), None
+        if response_get_order.status_code == 200:
+            return order_id, 200, response_get_order.json()
+        return order_id, response_get_order.status_code, None
+
+    # executor.map liefert die Ergebnisse in der Reihenfolge der Eingabe, unabhängig davon, welche Anfrage zuerst fertig ist
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return list(executor.map(fetch, order_ids))
+
+# Felder, die ein Eintrag der getOrders-Liste enthalten muss, damit auf getOrder verzichtet werden kann
+SUMMARY_REQUIRED_FIELDS = ("creationDate", "fulfillmentStartInstructions", "lineItems", "buyer", "cancelStatus")
+
+def has_required_fields(order):
+    """Prüft, ob ein Eintrag der getOrders-Liste alle für die Verarbeitung benötigten Felder enthält."""
+    if any(not order.get(field) for field in SUMMARY_REQUIRED_FIELDS):
+        return False
+    return bool(order["fulfillmentStartInstructions"][0].get("shippingStep", {}).get("shipTo"))
+
+# Standardwerte für den lokalen Zwischenspeicher der Bestelldetails
+DEFAULT_CACHE_TTL_HOURS = 24
+DEFAULT_CACHE_MAX_MB = 200
+
+def get_response_cache_path():
+    """Gibt den Pfad der SQLite-Datenbank des Zwischenspeichers im Anwendungsdatenverzeichnis zurück"""
+    return os.path.join(get_data_dir(), "response_cache.sqlite")
+
+class ResponseCache:
+    """
+    Lokaler Zwischenspeicher (SQLite) für Bestelldetails, Schlüssel ist Bestellnummer und lastModifiedDate.
+    Unveränderte Bestellungen aus überlappenden Zeiträumen werden so nicht erneut mit getOrder abgerufen.
+    Einträge verfallen nach ttl_seconds, bei Überschreiten von max_bytes werden die am längsten nicht
+    verwendeten Einträge entfernt (LRU). Mit read=False wird der Zwischenspeicher nur befüllt, aber nicht gelesen.
+    """
+
+    def __init__(self, db_path, ttl_seconds=DEFAULT_CACHE_TTL_HOURS * 3600, max_bytes=DEFAULT_CACHE_MAX_MB * 1024 * 1024,
+                 read=True):
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.read = read
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    order_id TEXT, last_modified TEXT, body TEXT, size INTEGER, created_at REAL, accessed_at REAL,
+                    PRIMARY KEY (order_id, last_modified))""")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+
+    def get(self, order_id, last_modified):
+        """Gibt die gespeicherten Bestelldetails zurück oder None, wenn kein gültiger Eintrag vorhanden ist"""
+        if not self.read or not order_id or not last_modified:
+            return None
+        now = time.time()
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                "SELECT body FROM responses WHERE order_id = ? AND last_modified = ? AND created_at > ?",
+                (order_id, last_modified, now - self.ttl_seconds)).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE order_id = ? AND last_modified = ?", (now, order_id, last_modified))
+        return json.loads(row[0])
+
+    def put(self, order_id, last_modified, order_details):
+        """Speichert Bestelldetails, ältere Stände derselben Bestellung werden ersetzt"""
+        if not order_id or not last_modified:
+            return
+        body = json.dumps(order_details, ensure_ascii=False)
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM responses WHERE order_id = ?", (order_id,))
+            self.connection.execute(
+                "INSERT INTO responses (order_id, last_modified, body, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (order_id, last_modified, body, len(body), now, now))
+
+    def prune(self):
+        """Entfernt abgelaufene Einträge und bei Überschreiten der Maximalgröße die am längsten nicht verwendeten"""
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM responses WHERE created_at <= ?", (time.time() - self.ttl_seconds,))
+            total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            evict = []
+            for order_id, last_modified, size in self.connection.execute(
+                    "SELECT order_id, last_modified, size FROM responses ORDER BY accessed_at"):
+                if total <= self.max_bytes:
+                    break
+                evict.append((order_id, last_modified))
+                total -= size
+            self.connection.executemany("DELETE FROM responses WHERE order_id = ? AND last_modified = ?", evict)
+
+    def close(self):
+        self.connection.close()
+
+def resolve_order_details(orders, session, max_workers=DEFAULT_MAX_WORKERS, summary_only=False, cache=None,
+                          is_cancelled=lambda: False):
+    """
+    Liefert die Bestelldetails für eine Seite der getOrders-Liste als Liste von Tupeln (order_id, status_code, order_details)
+    in der Reihenfolge der Liste.
+    Im Modus summary_only werden die Daten direkt aus der Liste übernommen und nur Bestellungen mit fehlenden Feldern
+    zusätzlich mit getOrder abgerufen, sonst wird jede Bestellung mit getOrder abgerufen.
+    Mit Zwischenspeicher werden unveränderte Bestellungen (gleiches lastModifiedDate) von der Festplatte gelesen
+    und neu abgerufene Bestelldetails gespeichert. Nach einem Abbruch (is_cancelled) werden keine weiteren getOrder-Anfragen gesendet.
+    """
+    results = [None] * len(orders)
+    to_fetch = []
+    for position, order in enumerate(orders):
+        order_id = order.get("orderId")
+        if summary_only and has_required_fields(order):
+            results[position] = (order_id, 200, order)
+            continue
+        cached = cache.get(order_id, order.get("lastModifiedDate")) if cache is not None else None
+        if cached is not None:
+            results[position] = (order_id, 200, cached)
+        else:
+            to_fetch.append(position)
+
+    fetched = fetch_order_details([orders[position].get("orderId") for position in to_fetch], session, max_workers,
+                                  is_cancelled)
+    for position, result in zip(to_fetch, fetched):
+        results[position] = result
+        if cache is not None and result[2] is not None:
+            cache.put(result[0], orders[position].get("lastModifiedDate"), result[2])
+    return results
+
+def intern(value):
+    """Internalisiert Zeichenketten, damit sich wiederholende Werte nur einmal im Speicher liegen"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+class OrderLine:
+    """
+    Kompakte Bestellzeile (eine pro Artikel).
+    Durch __slots__ entfällt das Wörterbuch pro Zeile; die Zeilen werden von der Verarbeitung bis zum Schreiben
+    in die Excel-Datei ohne Kopien weitergereicht.
+    """
+    __slots__ = ("order_id", "creationDate", "order_fulfillment_status", "cancel_status", "full_name", "Strasse",
+                 "city", "PLZ", "phone_number", "email", "buyer_username", "sku", "quantity", "price", "location")
+
+    def __init__(self, order_id, creationDate, order_fulfillment_status, cancel_status, full_name, Strasse, city, PLZ,
+                 phone_number, email, buyer_username, sku, quantity, price, location=DEFAULT_LOCATION):
+        self.order_id = order_id
+        self.creationDate = creationDate
+        self.order_fulfillment_status = order_fulfillment_status
+        self.cancel_status = cancel_status
+        self.full_name = full_name
+        self.Strasse = Strasse
+        self.city = city
+        self.PLZ = PLZ
+        self.phone_number = phone_number
+        self.email = email
+        self.buyer_username = buyer_username
+        self.sku = sku
+        self.quantity = quantity
+        self.price = price
+        self.location = location
+
+    def copy(self):
+        """Flache Kopie, nur für zusätzliche Zeilen aus der SKU-Umwandlung"""
+        return OrderLine(*(getattr(self, name) for name in self.__slots__))
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"OrderLine({fields})"
+
+def parse_order_lines(order_id, order_details, location=DEFAULT_LOCATION):
+    """
+    Wandelt die Daten einer Bestellung (getOrder oder Eintrag der getOrders-Liste) in eine Liste von Bestellzeilen um.
+    Für jeden Artikel der Bestellung wird eine OrderLine erzeugt; alle Zeilen einer Bestellung teilen sich die
+    Bestell- und Adressfelder, häufig wiederkehrende Werte (Status, Stadt, SKU) werden internalisiert.
+    location ist der Standort des Kontos für Spalte F.
+    """
+    order_lines = []
+
+    # Bestelldetails verarbeiten
+    shipping_step = order_details.get('fulfillmentStartInstructions', [{}])[0].get('shippingStep', {})
+    ship_to = shipping_step.get('shipTo', {})
+    creationDate = order_details.get('creationDate', 'Nicht angegeben')
+    order_fulfillment_status = intern(order_details.get('orderFulfillmentStatus', 'Nicht angegeben'))
+    cancel_status = intern(order_details.get('cancelStatus', {}).get('cancelState', 'Nicht angegeben'))
+    full_name = ship_to.get('fullName', 'Nicht angegeben')
+    contact_address = ship_to.get('contactAddress', {})
+    Strasse1 = contact_address.get('addressLine1', 'Nicht angegeben')
+    Strasse2 = contact_address.get('addressLine2', '')
+    # Wenn Strasse2 leer ist, dann ist Strasse gleich Strasse1, ansonsten ist Strasse gleich Strasse1 + ' (' + Strasse2 + ')'
+    Strasse = Strasse1 if not Strasse2 else Strasse1 + ' (' + Strasse2 + ')'
+    city = intern(contact_address.get('city', 'Nicht angegeben'))
+    PLZ = intern(contact_address.get('postalCode', 'Nicht angegeben'))
+    phone_number_dict = ship_to.get('primaryPhone', {})
+    phone_number = phone_number_dict.get('phoneNumber', 'Nicht angegeben')
+    email = ship_to.get('email', 'Nicht angegeben')
+    buyer_username = order_details.get('buyer', {}).get('username', 'Nicht angegeben')  # Benutzername des Käufers abrufen
+
+    # Eine Bestellung kann mehrere Artikel enthalten, daher müssen die Artikelinformationen durchlaufen werden
+    item_info = order_details.get('lineItems', [{}])
+    for item in item_info:
+        sku = intern(item.get('sku', 'Nicht angegeben'))
+        quantity = item.get('quantity', 'Nicht angegeben')
+
+        # Der von EBAY erhaltene Preis ist ein String und muss in einen Float-Typ umgewandelt werden, um mathematische Berechnungen durchführen zu können
+        price_str = item.get('discountedLineItemCost', {}).get('value', 'Nicht angegeben')  # Rabattierter Preis
+        price = float(price_str) if price_str != 'Nicht angegeben' and price_str is not None else 0.0
+
+        # Bestellzeile zur Liste hinzufügen
+        order_lines.append(OrderLine(order_id, creationDate, order_fulfillment_status, cancel_status, full_name, Strasse,
+                                     city, PLZ, phone_number, email, buyer_username, sku, quantity, price, location))
+
+    return order_lines
+
+# Anzahl der Bestellzeilen, die beim Sortieren insgesamt höchstens im Speicher gehalten werden
+DEFAULT_SORT_BUFFER_LINES = 100000
+
+class LineSpool:
+    """
+    Sammelt die Bestellzeilen eines Abrufauftrags und gibt sie nach Erstellungszeitpunkt sortiert wieder aus (externes
+    Sortieren). Im Speicher werden höchstens buffer_lines Zeilen gehalten; ist der Puffer voll, wird er sortiert in eine
+    temporäre Datei ausgelagert und die Läufe werden beim Auslesen mit heapq.merge zusammengeführt.
+    Erreicht die Zahl der Läufe max_runs, werden sie zu einem Lauf zusammengeführt. Beim Zusammenführen liegt von jedem
+    Lauf ein pickle-Block im Speicher; die Blockgröße richtet sich daher nach buffer_lines und max_runs, sodass auch das
+    Zusammenführen höchstens buffer_lines Zeilen im Speicher hält.
+    Die Sortierung ist stabil, die Reihenfolge entspricht damit list.sort über alle Zeilen.
+    """
+
+    # Höchstzahl der Zeilen pro pickle-Block in den temporären Dateien
+    CHUNK_LINES = 1000
+    # Höchstzahl ausgelagerter Läufe (offener temporärer Dateien), auf die LineSpools eines Laufs aufzuteilen
+    MAX_RUNS = 32
+
+    def __init__(self, buffer_lines=DEFAULT_SORT_BUFFER_LINES, max_runs=MAX_RUNS):
+        self.buffer_lines = max(1, buffer_lines)
+        self.max_runs = max(1, max_runs)
+        # Zeilen pro Block, sodass max_runs gleichzeitig gelesene Blöcke zusammen nicht mehr als buffer_lines umfassen
+        self.chunk_lines = max(1, min(self.CHUNK_LINES, self.buffer_lines // self.max_runs))
+        self.buffer = []
+        self.runs = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, line):
+        self.buffer.append(line)
+        self.count += 1
+        if len(self.buffer) >= self.buffer_lines:
+            self._spill()
+
+    def extend(self, lines):
+        for line in lines:
+            self.append(line)
+
+    def _spill(self):
+        """Schreibt den sortierten Puffer als neuen Lauf in eine temporäre Datei"""
+        self.buffer.sort(key=attrgetter("creationDate"))
+        self.runs.append(self._write_run(self.buffer))
+        self.buffer = []
+        if len(self.runs) >= self.max_runs:
+            runs = self.runs
+            self.runs = [self._write_run(heapq.merge(*[self._read_run(run) for run in runs],
+                                                     key=attrgetter("creationDate")))]
+            for run in runs:
+                run.close()
+
+    def _write_run(self, lines):
+        """Schreibt sortierte Zeilen blockweise in eine neue temporäre Datei"""
+        run = tempfile.TemporaryFile()
+        lines = iter(lines)
+        while True:
+            chunk = [[getattr(line, name) for name in OrderLine.__slots__]
+                     for line in itertools.islice(lines, self.chunk_lines)]
+            if not chunk:
+                return run
+            pickle.dump(chunk, run, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _read_run(run):
+        run.seek(0)
+        while True:
+            try:
+                chunk = pickle.load(run)
+            except EOFError:
+                return
+            for values in chunk:
+                yield OrderLine(*values)
+
+    def __iter__(self):
+        """Liefert alle Zeilen unsortiert (ausgelagerte Läufe zuerst), mehrfach möglich"""
+        for run in self.runs:
+            yield from self._read_run(run)
+        yield from self.buffer
+
+    def sorted_lines(self):
+        """Liefert alle Zeilen nach Erstellungszeitpunkt sortiert (Generator)"""
+        # Sind bereits Läufe ausgelagert, wird auch der Puffer ausgelagert, damit beim Zusammenführen neben den Blöcken
+        # der Läufe nicht zusätzlich der volle Puffer im Speicher liegt
+        if self.runs and self.buffer:
+            self._spill()
+        self.buffer.sort(key=attrgetter("creationDate"))
+        return heapq.merge(*[self._read_run(run) for run in self.runs], iter(self.buffer), key=attrgetter("creationDate"))
+
+    def close(self):
+        for run in self.runs:
+            run.close()
+        self.runs = []
+        self.buffer = []
+
+def skip_order_ids(lines, order_ids):
+    """Lässt die Bestellzeilen der angegebenen Bestellnummern aus (Generator)"""
+    for line in lines:
+        if line.order_id not in order_ids:
+            yield line
+
+def truncate_creation_dates(lines):
+    """Kürzt das Erstellungsdatum auf das Datum ohne Uhrzeit, sonst kommt es beim Schreiben in Excel zu Formatfehlern (Generator)"""
+    for line in lines:
+        line.creationDate = intern(line.creationDate[:10])
+        yield line
+
+def print_lines(lines, title):
+    """Gibt die Bestellzeilen beim Durchlaufen auf der Konsole aus (Generator, nur für die ausführliche Ausgabe)"""
+    print(title)
+    for line in lines:
+        print(line)
+        yield line
+    print()  # Leerzeile zur besseren Lesbarkeit
+
+# Unvollständige Läufe, die älter sind, werden nicht fortgesetzt, sondern neu begonnen
+DEFAULT_JOURNAL_MAX_AGE_HOURS = 24
+
+def get_run_journal_path():
+    """Gibt den Pfad der SQLite-Datenbank des Laufjournals im Anwendungsdatenverzeichnis zurück"""
+    return os.path.join(get_data_dir(), "run_journal.sqlite")
+
+def build_run_key(*parameters):
+    """Schlüssel eines Laufs aus seinen Parametern, ein neuer Start mit denselben Parametern setzt den Lauf fort"""
+    return hashlib.sha256(json.dumps(parameters, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+class RunJournal:
+    """
+    Journal (SQLite, nur anhängend) eines Verarbeitungslaufs, damit ein abgebrochener Lauf (abgelaufenes Token,
+    Netzwerkfehler, gesperrte Excel-Datei beim Speichern) nicht von vorn beginnen muss.
+    Die Bestellzeilen jeder abgerufenen Bestellung werden sofort gespeichert, der Laufstatus zeigt, ob der Abruf
+    vollständig war ("fetching" bzw. "fetched"). Ein neuer Lauf mit demselben Schlüssel überspringt bereits
+    abgerufene Bestellungen bzw. wiederholt nur das Schreiben. Nach erfolgreichem Schreiben wird das Journal geleert.
+    """
+
+    def __init__(self, db_path, run_key, max_age_seconds=DEFAULT_JOURNAL_MAX_AGE_HOURS * 3600):
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.run_key = run_key
+        now = time.time()
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS runs (run_key TEXT PRIMARY KEY, state TEXT, started_at REAL, updated_at REAL)")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS journal_orders (
+                    run_key TEXT, order_id TEXT, lines TEXT, PRIMARY KEY (run_key, order_id))""")
+            # Abgeschlossene und veraltete Läufe (auch mit anderen Schlüsseln) entfernen
+            stale = [key for (key,) in self.connection.execute(
+                "SELECT run_key FROM runs WHERE state = 'done' OR updated_at <= ?", (now - max_age_seconds,))]
+            self.connection.executemany("DELETE FROM journal_orders WHERE run_key = ?", [(key,) for key in stale])
+            self.connection.executemany("DELETE FROM runs WHERE run_key = ?", [(key,) for key in stale])
+            row = self.connection.execute("SELECT state FROM runs WHERE run_key = ?", (run_key,)).fetchone()
+            if row is None:
+                self.connection.execute("INSERT INTO runs (run_key, state, started_at, updated_at) VALUES (?, 'fetching', ?, ?)",
+                                        (run_key, now, now))
+        # Zustand des vorherigen Laufs mit demselben Schlüssel (None = neuer Lauf)
+        self.resumed_state = row[0] if row else None
+        self.resumed_orders = self.connection.execute(
+            "SELECT COUNT(*) FROM journal_orders WHERE run_key = ?", (run_key,)).fetchone()[0]
+
+    def lookup(self, order_ids):
+        """Gibt die gespeicherten Bestellzeilen der bereits abgerufenen Bestellungen zurück (Bestellnummer -> Zeilen)"""
+        order_ids = [order_id for order_id in order_ids if order_id]
+        found = {}
+        with self.lock:
+            for start in range(0, len(order_ids), 500):
+                chunk = order_ids[start:start + 500]
+                for order_id, lines in self.connection.execute(
+                        f"SELECT order_id, lines FROM journal_orders WHERE run_key = ? AND order_id IN ({', '.join('?' * len(chunk))})",
+                        [self.run_key, *chunk]):
+                    found[order_id] = [OrderLine(*values) for values in json.loads(lines)]
+        return found
+
+    def record(self, entries):
+        """Speichert die Bestellzeilen neu abgerufener Bestellungen [(Bestellnummer, Zeilen), ...] in einer Transaktion"""
+        rows = [(self.run_key, order_id, json.dumps([[getattr(line, name) for name in OrderLine.__slots__] for line in lines],
+                                                    ensure_ascii=False))
+                for order_id, lines in entries]
+        with self.lock, self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO journal_orders (run_key, order_id, lines) VALUES (?, ?, ?)", rows)
+            self.connection.execute("UPDATE runs SET updated_at = ? WHERE run_key = ?", (time.time(), self.run_key))
+
+    def order_ids(self):
+        """Gibt die Bestellnummern aller gespeicherten Bestellungen zurück"""
+        with self.lock:
+            return {order_id for (order_id,) in self.connection.execute(
+                "SELECT order_id FROM journal_orders WHERE run_key = ?", (self.run_key,))}
+
+    def iter_lines(self):
+        """Liefert alle gespeicherten Bestellzeilen, ohne sie vorher zu sammeln (Generator)"""
+        for (order_lines,) in self.connection.execute("SELECT lines FROM journal_orders WHERE run_key = ?", (self.run_key,)):
+            for values in json.loads(order_lines):
+                yield OrderLine(*values)
+
+    def set_state(self, state):
+        with self.lock, self.connection:
+            self.connection.execute("UPDATE runs SET state = ?, updated_at = ? WHERE run_key = ?", (state, time.time(), self.run_key))
+
+    def finish(self):
+        """Markiert den Lauf als abgeschlossen und entfernt seine Bestellzeilen"""
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM journal_orders WHERE run_key = ?", (self.run_key,))
+            self.connection.execute("UPDATE runs SET state = 'done', updated_at = ? WHERE run_key = ?", (time.time(), self.run_key))
+
+    def close(self):
+        self.connection.close()
+
+def fetch_account_orders(account, session, filter_str, orders_limit=0, order_ids=None, max_workers=DEFAULT_MAX_WORKERS,
+                         summary_only=False, cache=None, log=print, is_cancelled=lambda: False, metrics=None, label=None,
+                         journal=None, order_lines=None):
+    """
+    Ruft die Bestellungen eines Kontos seitenweise mit getOrders ab und verarbeitet jede Seite direkt mit getOrder weiter,
+    während die nächste Seite bereits im Hintergrund geladen wird. Mit order_ids werden nur diese Bestellungen abgerufen.
+    Meldungen erhalten label (Standard: Name des Kontos) als Präfix. Mit journal werden die Bestellzeilen jeder
+    abgerufenen Bestellung sofort gespeichert und bereits im Journal enthaltene Bestellungen nicht erneut abgerufen.
+    Die Bestellzeilen werden an order_lines (z.B. ein LineSpool, Standard: neue Liste) angehängt.
+    Gibt (Bestellzeilen, Anzahl der Bestellungen, gefundene Bestellnummern, höchster lastModifiedDate, vollständig abgerufen) zurück.
+    """
+    metrics = metrics or RunMetrics()
+    label = account.get("name") if label is None else label
+    prefix = f"[{label}] " if label else ""
+    location = account.get("location") or DEFAULT_LOCATION
+
+    order_lines = [] if order_lines is None else order_lines
+    total_orders = 0  # Gesamtzahl der Bestellungen aus der API-Antwort
+    found_order_ids = set()
+    new_watermark = None
+    fetch_complete = True
+
+    # Bestimmte Bestellungen werden blockweise über den orderIds-Filter abgerufen, die Liste enthält dabei bereits alle Details
+    if order_ids:
+        order_pages = iter_orders_by_ids(session, order_ids)
+        summary_only = True
+    else:
+        order_pages = iter_order_pages(session, filter_str, orders_limit)
+    try:
+        for orders in metrics.timed_iter("list_fetch", order_pages):
+            if is_cancelled():
+                break
+            found_order_ids.update(order.get("orderId") for order in orders)
+            for order in orders:
+                last_modified = order.get("lastModifiedDate")
+                if last_modified and (new_watermark is None or last_modified > new_watermark):
+                    new_watermark = last_modified
+            # Bestellungen, die ein abgebrochener Lauf bereits abgerufen hat, aus dem Journal übernehmen
+            journaled = journal.lookup([order.get("orderId") for order in orders]) if journal is not None else {}
+            if journaled:
+                orders = [order for order in orders if order.get("orderId") not in journaled]
+                for order_id, lines in journaled.items():
+                    total_orders += 1
+                    log(f"{prefix}{total_orders}. Bestellnummer: {order_id} (aus dem Journal)\n")
+                    order_lines.extend(lines)
+
+            # Empfänger- und Adressinformationen der Bestellungen dieser Seite parallel mit getOrder abrufen
+            # bzw. im Modus summary_only direkt aus der Bestellliste übernehmen
+            with metrics.stage("detail_fetch"):
+                order_results = resolve_order_details(orders, session, max_workers, summary_only, cache, is_cancelled)
+
+            # Ergebnisse in der ursprünglichen Reihenfolge der Bestellliste durchlaufen
+            journal_entries = []
+            for order_id, status_code, order_details in order_results:
+                # Nach einem Abbruch übersprungene Bestellungen weder zählen noch als Fehler melden
+                if status_code == CANCELLED_STATUS:
+                    fetch_complete = False
+                    continue
+                total_orders += 1
+                if order_details is not None:
+                    log(f"{prefix}{total_orders}. Bestellnummer: {order_id}\n")
+
+                    # Bestelldetails in Bestellzeilen (eine pro Artikel) umwandeln
+                    with metrics.stage("parse"):
+                        lines = parse_order_lines(order_id, order_details, location)
+                    order_lines.extend(lines)
+                    journal_entries.append((order_id, lines))
+                else:
+                    fetch_complete = False
+                    print(f"{prefix}Fehler beim Abrufen der Bestellung {order_id}, Statuscode: {status_code}")
+                    log(f"{prefix}Fehler beim Abrufen der Bestellung {order_id}, Statuscode: {status_code}\n")
+            # Neu abgerufene Bestellungen dieser Seite sofort im Journal sichern
+            if journal is not None and journal_entries:
+                journal.record(journal_entries)
+    except ApiError as e:
+        fetch_complete = False
+        print(f"{prefix}Fehler beim Abrufen der Bestellliste, Statuscode: {e.status_code}")
+        log(f"{prefix}Fehler beim Abrufen der Bestellliste, Statuscode: {e.status_code}\n")
+    return order_lines, total_orders, found_order_ids, new_watermark, fetch_complete
+
+# Standardregeln für die SKU-Umwandlung, werden als Vorlage in sku_rules.json gespeichert
+DEFAULT_SKU_RULES = {
+    # SKU mit diesem Suffix: Zeile ohne Suffix übernehmen und eine Zusatzzeile mit add_sku und add_price anhängen
+    "suffixes": [
+        {"suffix": "NF", "add_sku": "DWR30", "add_price": 0}
+    ],
+    # Produktfamilien aus Buchstaben + zwei mal zwei Ziffern (z.B. DR0808, HLMR1012):
+    # gleiche Ziffernpaare -> eine Zeile mit doppelter Menge, sonst zwei Zeilen, die zweite mit second_price
+    "pairs": [
+        {
+            "prefixes": ["HLMR", "DR", "CL", "DBL"],
+            "digit_map": {"10": "100", "11": "110", "12": "120"},
+            "second_price": 0
+        }
+    ]
+}
+
+def get_sku_rules_path():
+    """Pfad der SKU-Regeldatei im Anwendungsdatenverzeichnis"""
+    return os.path.join(get_data_dir(), "sku_rules.json")
+
+def load_sku_rules(path=None):
+    """
+    Lädt die SKU-Regeln aus der Regeldatei.
+    Existiert die Datei nicht, werden die Standardregeln verwendet und als Vorlage gespeichert, damit neue
+    Produktfamilien ohne Codeänderung ergänzt werden können.
+    """
+    path = path or get_sku_rules_path()
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Fehler beim Lesen der SKU-Regeln: {e}")
+            return DEFAULT_SKU_RULES
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(DEFAULT_SKU_RULES, f, ensure_ascii=False, indent=4)
+    except OSError as e:
+        print(f"Fehler beim Speichern der SKU-Regeln: {e}")
+    return DEFAULT_SKU_RULES
+
+class SkuRules:
+    """
+    Tabellengesteuerte SKU-Umwandlung.
+    Die Regeln werden einmal in Nachschlagetabellen übersetzt (Suffix-Länge -> Suffix -> Regel, Buchstaben -> Regel),
+    das Ergebnis wird pro SKU zwischengespeichert, da sich die SKUs im Katalog stark wiederholen.
+    """
+
+    def __init__(self, rules=None):
+        rules = DEFAULT_SKU_RULES if rules is None else rules
+        # Suffixe nach Länge gruppieren, längere Suffixe zuerst prüfen
+        suffixes = {}
+        for rule in rules.get("suffixes", []):
+            suffixes.setdefault(len(rule["suffix"]), {})[rule["suffix"]] = (rule["add_sku"], rule.get("add_price", 0))
+        self._suffixes = sorted(suffixes.items(), reverse=True)
+        # Buchstabenpräfix -> (Ziffernzuordnung, Preis der zweiten Zeile)
+        self._pairs = {}
+        for rule in rules.get("pairs", []):
+            for prefix in rule["prefixes"]:
+                self._pairs[prefix] = (rule.get("digit_map", {}), rule.get("second_price", 0))
+        self._memo = {}
+
+    def transform(self, sku):
+        """
+        Liefert die Ausgabezeilen für eine SKU als Tupel von (SKU, Mengenfaktor, Preis oder None = unverändert).
+        """
+        try:
+            return self._memo[sku]
+        except KeyError:
+            pass
+        result = self._memo[sku] = self._parse(sku)
+        return result
+
+    def _parse(self, sku):
+        # Zuerst prüfen, ob die SKU mit einem Zusatzartikel-Suffix endet (z.B. 'NF')
+        for length, table in self._suffixes:
+            rule = table.get(sku[-length:])
+            if rule is not None:
+                add_sku, add_price = rule
+                return (sku[:-length], 1, None), (add_sku, 1, add_price)
+
+        # SKU in Buchstaben, erste zwei Ziffern und letzte zwei Ziffern aufteilen
+        letters, first_two_digits, last_two_digits = sku[:-4], sku[-4:-2], sku[-2:]
+        rule = self._pairs.get(letters)
+        if rule is None or not (letters.isalpha() and first_two_digits.isdigit() and last_two_digits.isdigit()):
+            # Wenn die SKU keiner Regel entspricht, unverändert lassen
+            return ((sku, 1, None),)
+
+        digit_map, second_price = rule
+        first_two_digits = digit_map.get(first_two_digits, first_two_digits)
+        last_two_digits = digit_map.get(last_two_digits, last_two_digits)
+        if first_two_digits == last_two_digits:
+            # Eine Zeile mit doppelter Menge
+            return ((letters + first_two_digits, 2, None),)
+        # Zwei Zeilen, die zweite mit geändertem Preis
+        return (letters + first_two_digits, 1, None), (letters + last_two_digits, 1, second_price)
+
+    def iter_expand(self, orders):
+        """
+        Wendet die Regeln auf alle Bestellzeilen an und liefert die Ausgabezeilen einzeln (Generator).
+        Die erste Ausgabezeile verwendet die vorhandene Bestellzeile weiter, nur Zusatzzeilen werden kopiert.
+        """
+        for order_info in orders:
+            sku = order_info.sku
+            if not sku:
+                yield order_info
+                continue
+            lines = self.transform(sku)
+            rows = [order_info] + [order_info.copy() for _ in lines[1:]]
+            for row, (new_sku, factor, price) in zip(rows, lines):
+                row.sku = new_sku
+                if factor != 1:
+                    row.quantity = factor * row.quantity
+                if price is not None:
+                    row.price = price
+                yield row
+
+    def expand(self, orders):
+        """Wendet die Regeln in einem Durchgang auf alle Bestellzeilen an und gibt die Ausgabezeilen als Liste zurück"""
+        return list(self.iter_expand(orders))
+
+# Spalte der Bestellnummer in der Excel-Tabelle (H)
+ORDER_ID_COLUMN = 8
+
+def load_order_ids_from_excel(file_path, sheet_name):
+    """
+    Liest die Bestellnummern (Spalte H) des Arbeitsblatts ein und gibt sie als Menge zurück.
+    Die Arbeitsmappe wird schreibgeschützt im Streaming-Modus geöffnet und es wird nur Spalte H gelesen,
+    sodass auch sehr große Tabellen schnell und mit wenig Speicher durchsucht werden.
+    Löst FileNotFoundError bzw. KeyError aus, wenn die Datei bzw. das Arbeitsblatt nicht existiert.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True)
+    try:
+        sheet = workbook[sheet_name]
+        order_ids = set()
+        for row in sheet.iter_rows(min_row=2, min_col=ORDER_ID_COLUMN, max_col=ORDER_ID_COLUMN, values_only=True):
+            if row and row[0]:  # Überprüfen, ob Spalte H einen Wert enthält
+                order_ids.add(str(row[0]))
+        return order_ids
+    finally:
+        workbook.close()
+
+# Spalte der Artikelnummer (SKU) in der Excel-Tabelle (E)
+SKU_COLUMN = 5
+
+def iter_excel_order_rows(file_path, sheet_name):
+    """
+    Liefert für jede Zeile mit Bestellnummer ein Tupel (Zeilennummer, Bestellnummer, SKU) (Generator).
+    Wie load_order_ids_from_excel wird die Arbeitsmappe schreibgeschützt im Streaming-Modus gelesen, hier die Spalten E bis H.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True)
+    try:
+        sheet = workbook[sheet_name]
+        rows = sheet.iter_rows(min_row=2, min_col=SKU_COLUMN, max_col=ORDER_ID_COLUMN, values_only=True)
+        for row_number, row in enumerate(rows, 2):
+            if row and len(row) > ORDER_ID_COLUMN - SKU_COLUMN and row[-1]:
+                sku = row[0]
+                yield row_number, str(row[-1]), None if sku is None else str(sku)
+    finally:
+        workbook.close()
+
+# Spalte für den eBay-Status geänderter Bestellungen in der Excel-Tabelle (R, rechts neben den Bestelldaten)
+STATUS_COLUMN = 18
+
+# Stornierungsstatus, die keine Stornierung bedeuten
+NO_CANCEL_STATES = ("NONE_REQUESTED", "Nicht angegeben")
+
+def order_status_text(order):
+    """Gibt den eBay-Status einer Bestellzeile zurück: den Stornierungsstatus, sofern angefragt, sonst den Versandstatus"""
+    if order.cancel_status not in NO_CANCEL_STATES:
+        return order.cancel_status
+    return order.order_fulfillment_status
+
+def load_order_rows_from_excel(file_path, sheet_name):
+    """
+    Liest wie load_order_ids_from_excel die Bestellnummern (Spalte H) in einem schreibgeschützten Durchlauf ein,
+    dabei zusätzlich die Zeilennummern und den zuletzt eingetragenen Status (Spalte R) jeder Bestellung.
+    Gibt ein Wörterbuch Bestellnummer -> (Zeilennummern, Status) zurück.
+    Löst FileNotFoundError bzw. KeyError aus, wenn die Datei bzw. das Arbeitsblatt nicht existiert.
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True)
+    try:
+        sheet = workbook[sheet_name]
+        order_rows = {}
+        rows = sheet.iter_rows(min_row=2, min_col=ORDER_ID_COLUMN, max_col=STATUS_COLUMN, values_only=True)
+        for row_number, row in enumerate(rows, 2):
+            if row and row[0]:
+                status = row[-1] if len(row) > STATUS_COLUMN - ORDER_ID_COLUMN else None
+                entry = order_rows.setdefault(str(row[0]), ([], None))
+                entry[0].append(row_number)
+                if status:
+                    order_rows[str(row[0])] = (entry[0], str(status))
+        return order_rows
+    finally:
+        workbook.close()
+
+def find_status_changes(orders_list, order_rows):
+    """
+    Vergleicht den aktuellen Status der abgerufenen Bestellungen, die bereits in der Excel-Tabelle stehen, mit dem
+    zuletzt bekannten Status (order_rows: Bestellnummer -> (Zeilennummern, Status)).
+    Ist kein Status bekannt (vor dieser Funktion importiert), gilt nur eine Stornierung als Änderung, da stornierte
+    Bestellungen nie geschrieben werden. Gibt ein Wörterbuch Bestellnummer -> (Zeilennummern, neuer Status) zurück.
+    """
+    changes = {}
+    for order in orders_list:
+        entry = order_rows.get(order.order_id)
+        if entry is None or order.order_id in changes:
+            continue
+        rows, known_status = entry
+        status = order_status_text(order)
+        if known_status is None:
+            changed = order.cancel_status not in NO_CANCEL_STATES
+        else:
+            changed = status != known_status
+        if changed:
+            changes[order.order_id] = (rows, status)
+    return changes
+
+def get_order_index_path():
+    """Gibt den Pfad der SQLite-Datenbank des Bestellindex im Anwendungsdatenverzeichnis zurück"""
+    return os.path.join(get_data_dir(), "order_index.sqlite")
+
+def file_sha256(file_path):
+    """Berechnet die SHA-256-Prüfsumme einer Datei blockweise"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class OrderIndex:
+    """
+    Persistenter Index (SQLite) der Bestellnummern einer Excel-Tabelle.
+    Ordnet jeder Bestellnummer und SKU die Zeile in der Excel-Tabelle und den Zeitpunkt des Laufs zu, der sie geschrieben hat,
+    sowie jeder Bestellnummer den zuletzt bekannten eBay-Status (für den Statusabgleich).
+    Solange sich die Arbeitsmappe nicht außerhalb des Programms geändert hat (Änderungszeit, Größe und Prüfsumme),
+    muss Spalte H für den Duplikatabgleich nicht mehr gelesen werden.
+    """
+
+    def __init__(self, db_path, file_path, sheet_name):
+        self.connection = sqlite3.connect(db_path)
+        self.path = os.path.abspath(file_path)
+        self.sheet = sheet_name
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS workbooks (
+                    path TEXT, sheet TEXT, mtime_ns INTEGER, size INTEGER, sha256 TEXT,
+                    PRIMARY KEY (path, sheet))""")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS order_rows (
+                    path TEXT, sheet TEXT, row INTEGER, order_id TEXT, sku TEXT, run_at TEXT,
+                    PRIMARY KEY (path, sheet, row))""")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS order_rows_order_id ON order_rows (path, sheet, order_id)")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS order_status (
+                    path TEXT, sheet TEXT, order_id TEXT, status TEXT,
+                    PRIMARY KEY (path, sheet, order_id))""")
+
+    def close(self):
+        self.connection.close()
+
+    def is_current(self):
+        """
+        Prüft, ob der Index dem aktuellen Stand der Arbeitsmappe entspricht.
+        Stimmen Änderungszeit und Größe nicht überein, wird die Prüfsumme verglichen (z.B. nach dem Kopieren der Datei).
+        Löst FileNotFoundError aus, wenn die Arbeitsmappe nicht existiert.
+        """
+        stat = os.stat(self.path)
+        stored = self.connection.execute(
+            "SELECT mtime_ns, size, sha256 FROM workbooks WHERE path = ? AND sheet = ?", (self.path, self.sheet)).fetchone()
+        if stored is None:
+            return False
+        if stored[0] == stat.st_mtime_ns and stored[1] == stat.st_size:
+            return True
+        if stored[1] == stat.st_size and stored[2] == file_sha256(self.path):
+            with self.connection:
+                self._store_file_state(stat, stored[2])
+            return True
+        return False
+
+    def sync(self):
+        """
+        Gleicht den Index mit der Arbeitsmappe ab, nachdem sie außerhalb des Programms geändert wurde.
+        Spalte E bis H wird einmal gelesen und nur geänderte, neue oder entfernte Zeilen werden im Index aktualisiert.
+        Gibt die Anzahl der geänderten Indexeinträge zurück.
+        Löst FileNotFoundError bzw. KeyError aus, wenn die Datei bzw. das Arbeitsblatt nicht existiert.
+        """
+        indexed = {row: (order_id, sku) for row, order_id, sku in self.connection.execute(
+            "SELECT row, order_id, sku FROM order_rows WHERE path = ? AND sheet = ?", (self.path, self.sheet))}
+        changed = []
+        for row, order_id, sku in iter_excel_order_rows(self.path, self.sheet):
+            if indexed.pop(row, None) != (order_id, sku):
+                changed.append((self.path, self.sheet, row, order_id, sku))
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM order_rows WHERE path = ? AND sheet = ? AND row = ?",
+                [(self.path, self.sheet, row) for row in indexed])
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO order_rows (path, sheet, row, order_id, sku, run_at) VALUES (?, ?, ?, ?, ?, NULL)",
+                changed)
+            self._store_file_state(os.stat(self.path), file_sha256(self.path))
+        return len(changed) + len(indexed)
+
+    def existing_order_ids(self, order_ids):
+        """Gibt die Teilmenge der übergebenen Bestellnummern zurück, die bereits in der Excel-Tabelle stehen"""
+        order_ids = list(order_ids)
+        existing = set()
+        # In Blöcken abfragen, um die maximale Anzahl von SQL-Parametern nicht zu überschreiten
+        for i in range(0, len(order_ids), 500):
+            chunk = order_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            existing.update(order_id for (order_id,) in self.connection.execute(
+                f"SELECT DISTINCT order_id FROM order_rows WHERE path = ? AND sheet = ? AND order_id IN ({placeholders})",
+                (self.path, self.sheet, *chunk)))
+        return existing
+
+    def order_rows(self, order_ids):
+        """
+        Gibt für die übergebenen Bestellnummern, die bereits in der Excel-Tabelle stehen, ihre Zeilennummern und den
+        zuletzt bekannten Status zurück (Bestellnummer -> (Zeilennummern, Status)), ohne die Arbeitsmappe zu lesen
+        """
+        order_ids = list(order_ids)
+        order_rows = {}
+        for i in range(0, len(order_ids), 500):
+            chunk = order_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for order_id, row, status in self.connection.execute(f"""
+                    SELECT r.order_id, r.row, s.status FROM order_rows r
+                    LEFT JOIN order_status s ON s.path = r.path AND s.sheet = r.sheet AND s.order_id = r.order_id
+                    WHERE r.path = ? AND r.sheet = ? AND r.order_id IN ({placeholders}) ORDER BY r.row""",
+                    (self.path, self.sheet, *chunk)):
+                order_rows.setdefault(order_id, ([], status))[0].append(row)
+        return order_rows
+
+    def record_statuses(self, statuses):
+        """Speichert den Status der Bestellungen {Bestellnummer: Status} (innerhalb einer Transaktion aufzurufen)"""
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO order_status (path, sheet, order_id, status) VALUES (?, ?, ?, ?)",
+            [(self.path, self.sheet, str(order_id), status) for order_id, status in statuses.items()])
+
+    def record_rows(self, first_row, orders_list, run_at):
+        """
+        Trägt neu geschriebene Zeilen ab first_row in den Index ein (innerhalb einer Transaktion aufzurufen).
+        Zeilen unterhalb von first_row werden wie in der Arbeitsmappe um die Anzahl der neuen Zeilen verschoben.
+        """
+        count = len(orders_list)
+        # Zweistufig verschieben, damit der Primärschlüssel (Zeile) zwischendurch nicht doppelt vergeben ist
+        self.connection.execute(
+            "UPDATE order_rows SET row = -(row + ?) WHERE path = ? AND sheet = ? AND row > ?",
+            (count, self.path, self.sheet, first_row))
+        self.connection.execute(
+            "UPDATE order_rows SET row = -row WHERE path = ? AND sheet = ? AND row < 0", (self.path, self.sheet))
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO order_rows (path, sheet, row, order_id, sku, run_at) VALUES (?, ?, ?, ?, ?, ?)",
+            [(self.path, self.sheet, row, str(order.order_id), order.sku, run_at)
+             for row, order in enumerate(orders_list, first_row)])
+        # Status beim Import merken, damit spätere Läufe Änderungen erkennen
+        self.record_statuses({order.order_id: order_status_text(order) for order in orders_list})
+
+    def mark_current(self):
+        """Speichert Änderungszeit, Größe und Prüfsumme der Arbeitsmappe (innerhalb einer Transaktion aufzurufen)"""
+        self._store_file_state(os.stat(self.path), file_sha256(self.path))
+
+    def _store_file_state(self, stat, sha256):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO workbooks (path, sheet, mtime_ns, size, sha256) VALUES (?, ?, ?, ?, ?)",
+            (self.path, self.sheet, stat.st_mtime_ns, stat.st_size, sha256))
+
+def open_order_index(file_path, sheet_name):
+    """
+    Öffnet den Bestellindex des Arbeitsblatts und gleicht ihn ab, falls die Arbeitsmappe außerhalb des Programms geändert wurde.
+    Gibt None zurück, wenn der Index nicht verwendet werden kann; die Bestellnummern werden dann wie bisher direkt gelesen.
+    Löst FileNotFoundError bzw. KeyError aus, wenn die Datei bzw. das Arbeitsblatt nicht existiert.
+    """
+    try:
+        order_index = OrderIndex(get_order_index_path(), file_path, sheet_name)
+    except sqlite3.Error as e:
+        print(f"Fehler beim Öffnen des Bestellindex: {e}")
+        return None
+    try:
+        if not order_index.is_current():
+            print("Bestellindex wird mit der Excel-Datei abgeglichen...")
+            changes = order_index.sync()
+            print(f"Bestellindex aktualisiert, {changes} Einträge geändert")
+    except sqlite3.Error as e:
+        print(f"Fehler beim Aktualisieren des Bestellindex: {e}")
+        order_index.close()
+        return None
+    except Exception:
+        order_index.close()
+        raise
+    return order_index
+
+# Zahlenformat der Datumsspalte A in der Excel-Tabelle
+EXCEL_DATE_FORMAT = "DD.MM.YY"
+
+def order_to_row(order):
+    """
+    Wandelt eine verarbeitete Bestellzeile in die Werte der Spalten A bis Q der Excel-Tabelle um.
+    Das Bestelldatum wird dabei bereits in ein Datumsobjekt umgewandelt, Spalte I bleibt leer.
+    """
+    return (
+        datetime.strptime(str(order.creationDate), "%Y-%m-%d"),  # A: Bestelldatum
+        'Ebay',  # B: Plattform
+        order.quantity,  # C: Menge
+        order.price,  # D: Preis
+        order.sku,  # E: Artikelnummer
+        order.location,  # F: Standort
+        'Ebay',  # G: Verkaufsplattform
+        order.order_id,  # H: Bestellnummer
+        None,  # I: leer
+        order.buyer_username,  # J: Käufername
+        order.email,  # K: E-Mail-Adresse
+        order.phone_number,  # L: Telefonnummer
+        'Versand',  # M: Versand
+        order.full_name,  # N: Empfängername
+        order.Strasse,  # O: Straße
+        order.PLZ,  # P: Postleitzahl
+        order.city,  # Q: Stadt
+    )
+
+def find_next_row(sheet):
+    """Gibt die erste Zeile zurück, deren Zelle in Spalte A leer ist (einmaliger Durchlauf über Spalte A)."""
+    for row_number, (value,) in enumerate(sheet.iter_rows(min_row=1, max_row=sheet.max_row, max_col=1, values_only=True), 1):
+        if not value:
+            return row_number
+    return sheet.max_row + 1
+
+def write_orders_to_excel(orders_list, file_path, sheet_name, order_index=None, metrics=None, status_changes=None,
+                          write_status=False):
+    """
+    Hängt die Bestellzeilen in einem Durchgang an das Arbeitsblatt an und speichert die Arbeitsmappe.
+    Das Ende der Daten wird einmalig bestimmt. Liegen darunter noch weitere Zeilen, werden diese
+    mit einem einzigen insert_rows-Aufruf nach unten verschoben statt einmal pro Bestellung.
+    Wird ein Bestellindex übergeben, wird er in derselben Transaktion wie das Speichern aktualisiert
+    und bei einem Fehler beim Speichern zurückgesetzt.
+    Mit status_changes (siehe find_status_changes) wird in denselben Speichervorgang der neue Status in Spalte R der
+    vorhandenen Zeilen dieser Bestellungen eingetragen, ohne die übrigen Zeilen zu lesen oder neu zu schreiben.
+    Mit write_status erhalten neue Zeilen ihren Anfangsstatus in Spalte R, damit spätere Läufe Änderungen auch ohne
+    Bestellindex erkennen.
+    Laden, Schreiben und Speichern werden getrennt in metrics gemessen.
+    Gibt die Anzahl der geschriebenen Zeilen zurück.
+    """
+    import openpyxl
+
+    metrics = metrics or RunMetrics()
+
+    # Excel-Datei öffnen und Arbeitsblatt mit dem angegebenen Namen auswählen
+    with metrics.stage("excel_load"):
+        workbook = openpyxl.load_workbook(file_path)
+        sheet = workbook[sheet_name]  # Direkter Zugriff auf das Arbeitsblatt, um DeprecationWarning zu vermeiden
+
+    with metrics.stage("excel_write"):
+        # Status geänderter Bestellungen vor dem Einfügen eintragen, die Zeilennummern gelten für den bisherigen Stand
+        status_changes = status_changes or {}
+        for rows, status in status_changes.values():
+            for row_number in rows:
+                sheet.cell(row=row_number, column=STATUS_COLUMN, value=status)
+
+        # Nächste leere Zeile in Spalte A finden, um mit dem Schreiben zu beginnen
+        next_row = find_next_row(sheet)
+
+        # Nachfolgende Zeilen einmalig um die Anzahl der neuen Zeilen nach unten verschieben
+        if orders_list and next_row < sheet.max_row:
+            sheet.insert_rows(next_row + 1, amount=len(orders_list))
+
+        # Jede Bestellung als vollständige Zeile schreiben, das Datum ist bereits umgewandelt
+        for row_number, order in enumerate(orders_list, next_row):
+            for column, value in enumerate(order_to_row(order), 1):
+                if value is not None:
+                    sheet.cell(row=row_number, column=column, value=value)
+            sheet.cell(row=row_number, column=1).number_format = EXCEL_DATE_FORMAT
+            if write_status:
+                sheet.cell(row=row_number, column=STATUS_COLUMN, value=order_status_text(order))
+
+    # Excel-Datei speichern
+    with metrics.stage("excel_save"):
+        if order_index is None:
+            workbook.save(file_path)
+        else:
+            with order_index.connection:
+                order_index.record_rows(next_row, orders_list, datetime.now(timezone.utc).isoformat(timespec="seconds"))
+                order_index.record_statuses({order_id: status for order_id, (rows, status) in status_changes.items()})
+                workbook.save(file_path)
+                order_index.mark_current()
+    metrics.count("rows_written", len(orders_list))
+    metrics.count("rows_updated", sum(len(rows) for rows, status in status_changes.values()))
+    return len(orders_list)
+
+# Spaltenüberschriften A bis Q für CSV- und neue XLSX-Ausgaben
+OUTPUT_HEADERS = ("Datum", "Plattform", "Menge", "Preis", "Artikelnummer", "Standort", "Verkaufsplattform",
+                  "Bestellnummer", "", "Käufername", "E-Mail", "Telefon", "Versand", "Empfänger", "Straße", "PLZ", "Stadt")
+
+class CsvSink:
+    """
+    Hängt Bestellzeilen zeilenweise an eine CSV-Datei an (Spalten A bis Q, Semikolon als Trennzeichen, UTF-8 mit BOM
+    für Excel). Eine neue Datei erhält eine Kopfzeile.
+    Die Zeilen werden zuerst in eine Zwischendatei neben der CSV-Datei geschrieben und erst mit commit angehängt;
+    rollback setzt die CSV-Datei auf den Stand vor commit zurück, ein fehlgeschlagener Lauf hinterlässt so keine
+    halb angehängten Zeilen.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.staging_path = f"{path}.tmp"
+        self.committed_size = None
+
+    def write(self, orders):
+        """Schreibt die Bestellzeilen einzeln in die Zwischendatei, ohne sie vorher zu sammeln, und gibt die Anzahl zurück"""
+        import csv
+
+        count = 0
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.staging_path, 'w', newline='', encoding='utf-8-sig' if new_file else 'utf-8') as f:
+            writer = csv.writer(f, delimiter=';')
+            if new_file:
+                writer.writerow(OUTPUT_HEADERS)
+            for order in orders:
+                row = order_to_row(order)
+                writer.writerow((row[0].date().isoformat(),) + row[1:])
+                count += 1
+        return count
+
+    def commit(self):
+        """Hängt die Zwischendatei an die CSV-Datei an; schlägt das fehl, wird die CSV-Datei zurückgesetzt"""
+        import shutil
+
+        self.committed_size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        try:
+            with open(self.staging_path, 'rb') as staged, open(self.path, 'ab') as f:
+                shutil.copyfileobj(staged, f)
+        except OSError:
+            self.rollback()
+            raise
+        os.remove(self.staging_path)
+
+    def rollback(self):
+        """Kürzt die CSV-Datei auf den Stand vor commit und verwirft die Zwischendatei"""
+        if self.committed_size is not None and os.path.exists(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(self.committed_size)
+        self.committed_size = None
+        if os.path.exists(self.staging_path):
+            os.remove(self.staging_path)
+
+    def order_ids(self):
+        """Liest die Bestellnummern (Spalte H) einer vorhandenen Datei einmalig ein"""
+        import csv
+
+        if not os.path.exists(self.path):
+            return set()
+        with open(self.path, newline='', encoding='utf-8-sig') as f:
+            rows = csv.reader(f, delimiter=';')
+            next(rows, None)  # Kopfzeile
+            return {row[ORDER_ID_COLUMN - 1] for row in rows if len(row) >= ORDER_ID_COLUMN and row[ORDER_ID_COLUMN - 1]}
+
+class SqliteSink:
+    """
+    Schreibt Bestellzeilen in eine SQLite-Tabelle. Bestellnummer und laufende Zeilennummer innerhalb der Bestellung
+    bilden den Primärschlüssel (eine Bestellung kann nach den SKU-Regeln mehrere Zeilen mit derselben SKU haben),
+    erneut exportierte Zeilen ersetzen daher die vorhandenen statt doppelt einzugehen.
+    """
+
+    COLUMNS = ("order_date", "platform", "quantity", "price", "sku", "location", "sales_platform", "order_id",
+               "line_no", "buyer_username", "email", "phone_number", "shipping", "full_name", "street", "postal_code",
+               "city")
+
+    def __init__(self, path, table="orders"):
+        self.path = path
+        self.table = table
+
+    def write(self, orders):
+        """
+        Schreibt die Bestellzeilen in einer Transaktion über einen Generator und gibt die Anzahl der neu hinzugekommenen
+        Zeilen zurück (ersetzte Zeilen werden nicht gezählt). Die Zeilen einer Bestellung kommen zusammenhängend an.
+        """
+        def rows():
+            last_order_id = None
+            line_no = 0
+            for order in orders:
+                row = order_to_row(order)
+                line_no = line_no + 1 if order.order_id == last_order_id else 1
+                last_order_id = order.order_id
+                # Spalte I ist immer leer und wird nicht gespeichert
+                yield (row[0].date().isoformat(),) + row[1:8] + (line_no,) + row[9:]
+
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:
+                self._create_table(connection)
+                before = connection.execute(f'SELECT COUNT(*) FROM "{self.table}"').fetchone()[0]
+                connection.executemany(
+                    f'INSERT OR REPLACE INTO "{self.table}" ({", ".join(self.COLUMNS)}) '
+                    f'VALUES ({", ".join("?" * len(self.COLUMNS))})', rows())
+                after = connection.execute(f'SELECT COUNT(*) FROM "{self.table}"').fetchone()[0]
+        finally:
+            connection.close()
+        return after - before
+
+    def commit(self):
+        """Die Zeilen sind bereits mit write in einer eigenen Transaktion gespeichert"""
+
+    def rollback(self):
+        """Ersetzte Zeilen können nicht doppelt eingehen, es ist nichts zurückzusetzen"""
+
+    def order_ids(self):
+        """Liest die Bestellnummern einer vorhandenen Tabelle einmalig ein"""
+        if not os.path.exists(self.path):
+            return set()
+        connection = sqlite3.connect(self.path)
+        try:
+            if not connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.table,)).fetchone():
+                return set()
+            return {order_id for (order_id,) in connection.execute(f'SELECT DISTINCT order_id FROM "{self.table}"')}
+        finally:
+            connection.close()
+
+    def _create_table(self, connection):
+        """Erstellt die Tabelle bzw. übernimmt eine Tabelle des früheren Schlüssels (Bestellnummer, SKU) mit Zeilennummern"""
+        columns = [name for _, name, *_ in connection.execute(f'PRAGMA table_info("{self.table}")')]
+        if columns and "line_no" not in columns:
+            connection.execute(f'ALTER TABLE "{self.table}" RENAME TO "{self.table}_old"')
+        connection.execute(
+            f'CREATE TABLE IF NOT EXISTS "{self.table}" ({", ".join(self.COLUMNS)}, PRIMARY KEY (order_id, line_no))')
+        if columns and "line_no" not in columns:
+            old_columns = ", ".join(name if name != "line_no" else
+                                    "ROW_NUMBER() OVER (PARTITION BY order_id ORDER BY rowid)" for name in self.COLUMNS)
+            connection.execute(f'INSERT INTO "{self.table}" ({", ".join(self.COLUMNS)}) '
+                               f'SELECT {old_columns} FROM "{self.table}_old"')
+            connection.execute(f'DROP TABLE "{self.table}_old"')
+
+class XlsxSink:
+    """
+    Schreibt Bestellzeilen in eine neue Arbeitsmappe im write_only-Modus von openpyxl (z.B. für Monatsdateien).
+    Die Zeilen werden direkt in die Datei gestreamt, ohne die Arbeitsmappe im Speicher aufzubauen.
+    An eine bereits vorhandene Ausgabe wird mit write_orders_to_excel angehängt (die Arbeitsmappe wird dafür geladen).
+    """
+
+    def __init__(self, path, sheet_name="Bestellungen"):
+        self.path = path
+        self.sheet_name = sheet_name
+
+    def write(self, orders):
+        """
+        Schreibt die Bestellzeilen einzeln in die neue Arbeitsmappe bzw. hängt sie an die vorhandene an und gibt die
+        Anzahl zurück. Ohne Bestellzeilen bleibt die Datei unverändert.
+        """
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+
+        orders = iter(orders)
+        first = next(orders, None)
+        if first is None:
+            return 0
+        orders = itertools.chain((first,), orders)
+        if os.path.exists(self.path):
+            orders_list = list(orders)
+            write_orders_to_excel(orders_list, self.path, self.sheet_name)
+            return len(orders_list)
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet(self.sheet_name)
+        sheet.append(OUTPUT_HEADERS)
+        count = 0
+        for order in orders:
+            row = list(order_to_row(order))
+            date_cell = WriteOnlyCell(sheet, value=row[0])
+            date_cell.number_format = EXCEL_DATE_FORMAT
+            row[0] = date_cell
+            sheet.append(row)
+            count += 1
+        workbook.save(self.path)
+        return count
+
+    def commit(self):
+        """Die Arbeitsmappe ist bereits mit write gespeichert"""
+
+    def rollback(self):
+        """Die Arbeitsmappe wird nur als Ganzes gespeichert, es ist nichts zurückzusetzen"""
+
+    def order_ids(self):
+        """Liest die Bestellnummern (Spalte H) einer vorhandenen Arbeitsmappe einmalig ein"""
+        if not os.path.exists(self.path):
+            return set()
+        try:
+            return load_order_ids_from_excel(self.path, self.sheet_name)
+        except KeyError:
+            return set()
+
+def get_shard_path(excel_path, period):
+    """Gibt den Pfad der Monatsarbeitsmappe zurück, z.B. Bestellungen_2024-05.xlsx neben Bestellungen.xlsx"""
+    stem, extension = os.path.splitext(excel_path)
+    return f"{stem}_{period}{extension or '.xlsx'}"
+
+class ShardManifest:
+    """
+    Manifest (SQLite neben der Arbeitsmappe) der Monatsarbeitsmappen: welche Bestellnummern in welchem Monat stehen.
+    Der Duplikatabgleich fragt damit nur die Monate der abgerufenen Bestellungen ab, ohne eine Arbeitsmappe zu öffnen.
+    since ist der Tag, an dem die Monatsarbeitsmappen begonnen wurden; ältere Bestellungen können noch in der
+    bisherigen Arbeitsmappe stehen.
+    """
+
+    def __init__(self, excel_path):
+        self.connection = sqlite3.connect(os.path.splitext(excel_path)[0] + "_manifest.sqlite")
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS shards (period TEXT PRIMARY KEY, path TEXT, rows INTEGER)")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS shard_orders (
+                    period TEXT, order_id TEXT, PRIMARY KEY (period, order_id))""")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS manifest_info (key TEXT PRIMARY KEY, value TEXT)")
+            self.connection.execute("INSERT OR IGNORE INTO manifest_info (key, value) VALUES ('since', ?)",
+                                    (datetime.now(timezone.utc).strftime("%Y-%m-%d"),))
+        self.since = self.connection.execute("SELECT value FROM manifest_info WHERE key = 'since'").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+    def existing_order_ids(self, orders):
+        """Gibt die Bestellnummern der Bestellzeilen zurück, die bereits in der Monatsarbeitsmappe ihres Erstellungsmonats stehen"""
+        by_period = {}
+        for order in orders:
+            by_period.setdefault(order.creationDate[:7], set()).add(order.order_id)
+        existing = set()
+        for period, order_ids in by_period.items():
+            order_ids = list(order_ids)
+            for i in range(0, len(order_ids), 500):
+                chunk = order_ids[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                existing.update(order_id for (order_id,) in self.connection.execute(
+                    f"SELECT order_id FROM shard_orders WHERE period = ? AND order_id IN ({placeholders})", (period, *chunk)))
+        return existing
+
+    def record(self, period, path, orders):
+        """Trägt die in die Monatsarbeitsmappe geschriebenen Bestellzeilen ein (innerhalb einer Transaktion aufzurufen)"""
+        self.connection.executemany("INSERT OR IGNORE INTO shard_orders (period, order_id) VALUES (?, ?)",
+                                    [(period, str(order.order_id)) for order in orders])
+        self.connection.execute(
+            "INSERT INTO shards (period, path, rows) VALUES (?, ?, ?) "
+            "ON CONFLICT (period) DO UPDATE SET path = excluded.path, rows = rows + excluded.rows",
+            (period, os.path.abspath(path), len(orders)))
+
+def write_orders_to_shards(orders_list, excel_path, sheet_name, manifest, metrics=None):
+    """
+    Verteilt die nach Datum sortierten Bestellzeilen (Liste oder Generator) nach Erstellungsmonat auf Monatsarbeitsmappen
+    (siehe get_shard_path).
+    Eine neue Monatsarbeitsmappe wird im write_only-Modus erstellt (XlsxSink), an eine bestehende wird mit
+    write_orders_to_excel angehängt; geladen und gespeichert wird damit nur der jeweilige Monat, nicht der gesamte Bestand.
+    Das Manifest wird pro Monat in derselben Transaktion wie das Speichern aktualisiert.
+    Gibt die Anzahl der geschriebenen Zeilen zurück.
+    """
+    metrics = metrics or RunMetrics()
+    # Nach Datum sortierte Zeilen kommen monatsweise zusammenhängend an, im Speicher liegt jeweils nur ein Monat
+    written = 0
+    for period, orders in itertools.groupby(orders_list, key=lambda order: order.creationDate[:7]):
+        orders = list(orders)
+        written += len(orders)
+        path = get_shard_path(excel_path, period)
+        with manifest.connection:
+            manifest.record(period, path, orders)
+            if os.path.exists(path):
+                write_orders_to_excel(orders, path, sheet_name, None, metrics)
+            else:
+                with metrics.stage("excel_save"):
+                    XlsxSink(path, sheet_name).write(orders)
+                metrics.count("rows_written", len(orders))
+    return written
+
+# Ausgabeformate nach Dateiendung
+SINKS_BY_EXTENSION = {
+    ".csv": CsvSink,
+    ".sqlite": SqliteSink,
+    ".db": SqliteSink,
+    ".xlsx": XlsxSink,
+}
+
+def open_sink(path):
+    """Wählt die Ausgabe anhand der Dateiendung aus, löst ValueError bei unbekannten Endungen aus"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in SINKS_BY_EXTENSION:
+        raise ValueError(f"Unbekanntes Ausgabeformat: {extension or path} (unterstützt: {', '.join(SINKS_BY_EXTENSION)})")
+    return SINKS_BY_EXTENSION[extension](path)
+
+class ExportIndex:
+    """
+    Bestellnummern, die bereits in eine Ausgabe (output_path) geschrieben wurden, im Bestellindex (SQLite).
+    Der Duplikatabgleich muss die Ausgabedatei damit nicht bei jedem Lauf lesen; eine vorhandene Datei wird nur beim
+    ersten Mal eingelesen. Fehlt die Ausgabedatei (z.B. gelöscht), beginnt die Liste von vorn.
+    """
+
+    def __init__(self, db_path, output_path, sink):
+        self.connection = sqlite3.connect(db_path)
+        self.path = os.path.abspath(output_path)
+        self.pending = set()
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS exports (path TEXT PRIMARY KEY)")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS exported_orders (
+                    path TEXT, order_id TEXT, PRIMARY KEY (path, order_id))""")
+            known = self.connection.execute("SELECT 1 FROM exports WHERE path = ?", (self.path,)).fetchone()
+            if known is None or not os.path.exists(self.path):
+                self.connection.execute("DELETE FROM exported_orders WHERE path = ?", (self.path,))
+                self.connection.executemany("INSERT OR IGNORE INTO exported_orders (path, order_id) VALUES (?, ?)",
+                                            [(self.path, order_id) for order_id in sink.order_ids()])
+                self.connection.execute("INSERT OR IGNORE INTO exports (path) VALUES (?)", (self.path,))
+
+    def existing_order_ids(self, order_ids):
+        """Gibt die Teilmenge der übergebenen Bestellnummern zurück, die bereits exportiert wurden"""
+        order_ids = list(order_ids)
+        existing = set()
+        for i in range(0, len(order_ids), 500):
+            chunk = order_ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            existing.update(order_id for (order_id,) in self.connection.execute(
+                f"SELECT order_id FROM exported_orders WHERE path = ? AND order_id IN ({placeholders})", (self.path, *chunk)))
+        return existing
+
+    def track(self, orders):
+        """Merkt sich die Bestellnummern der Zeilen, während sie an die Ausgabe weitergereicht werden (Generator)"""
+        for order in orders:
+            self.pending.add(order.order_id)
+            yield order
+
+    def record(self):
+        """Trägt die weitergereichten Bestellnummern ein (innerhalb einer Transaktion aufzurufen)"""
+        self.connection.executemany("INSERT OR IGNORE INTO exported_orders (path, order_id) VALUES (?, ?)",
+                                    [(self.path, str(order_id)) for order_id in self.pending])
+        self.pending = set()
+
+    def close(self):
+        self.connection.close()
+
+class SalesAggregates:
+    """
+    Laufende Verkaufssummen (Menge, Umsatz, Anzahl Bestellungen) pro SKU und Tag bzw. Monat in einer SQLite-Datei
+    neben dem Ziel (z.B. Bestellungen_aggregates.sqlite). Jeder Lauf addiert nur seine neu geschriebenen Zeilen
+    (nach SKU-Regeln und Duplikatabgleich), Auswertungen müssen die Tabelle daher nie vollständig lesen.
+    """
+
+    def __init__(self, target_path):
+        self.path = os.path.splitext(target_path)[0] + "_aggregates.sqlite"
+        self.connection = sqlite3.connect(self.path)
+        with self.connection:
+            for table, period in (("daily_sales", "day"), ("monthly_sales", "month")):
+                self.connection.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        {period} TEXT, sku TEXT, quantity INTEGER, revenue REAL, orders INTEGER,
+                        PRIMARY KEY ({period}, sku))""")
+        # Summen dieses Laufs: (Tag, SKU) -> [Menge, Umsatz, Bestellnummern]
+        self.pending = {}
+
+    def add(self, order):
+        """Nimmt eine neue Bestellzeile in die Summen dieses Laufs auf"""
+        entry = self.pending.get((order.creationDate[:10], order.sku))
+        if entry is None:
+            entry = self.pending[(order.creationDate[:10], order.sku)] = [0, 0.0, set()]
+        entry[0] += order.quantity if isinstance(order.quantity, int) else 0
+        entry[1] += order.price
+        entry[2].add(order.order_id)
+
+    def track(self, orders):
+        """Nimmt die Bestellzeilen auf, während sie weitergereicht werden (Generator, z.B. vor einer Ausgabe)"""
+        for order in orders:
+            self.add(order)
+            yield order
+
+    def commit(self):
+        """Addiert die Summen dieses Laufs in einer Transaktion zu den gespeicherten Summen"""
+        rows = [(day, sku, quantity, round(revenue, 2), len(order_ids))
+                for (day, sku), (quantity, revenue, order_ids) in self.pending.items()]
+        with self.connection:
+            for table, period, length in (("daily_sales", "day", 10), ("monthly_sales", "month", 7)):
+                self.connection.executemany(f"""
+                    INSERT INTO {table} ({period}, sku, quantity, revenue, orders) VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT ({period}, sku) DO UPDATE SET quantity = quantity + excluded.quantity,
+                        revenue = round(revenue + excluded.revenue, 2), orders = orders + excluded.orders""",
+                    [(day[:length], *values) for day, *values in rows])
+        self.pending = {}
+        return len(rows)
+
+    def write_summary(self, path):
+        """
+        Schreibt die gespeicherten Summen im write_only-Modus in eine Übersichtsarbeitsmappe (Blätter pro Tag und
+        pro Monat). Die Datei wird zuerst vollständig geschrieben und dann ersetzt.
+        """
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        for title, table, period, header in (("Pro Monat", "monthly_sales", "month", "Monat"),
+                                             ("Pro Tag", "daily_sales", "day", "Datum")):
+            sheet = workbook.create_sheet(title)
+            sheet.append((header, "Artikelnummer", "Menge", "Umsatz", "Bestellungen"))
+            for row in self.connection.execute(
+                    f"SELECT {period}, sku, quantity, revenue, orders FROM {table} ORDER BY {period}, sku"):
+                sheet.append(row)
+        temp_path = f"{path}.tmp"
+        workbook.save(temp_path)
+        os.replace(temp_path, path)
+
+    def close(self):
+        self.connection.close()
+
 """
 Hauptlogik zur Datenverarbeitung
 1. Alle Bestellungen mit getOrders aus Fulfillment abrufen und dann mit getOrder jede Bestellung durchlaufen, um Informationen in einer Liste zu speichern
@@ -94,6 +1983,38 @@ Hauptlogik zur Datenverarbeitung
 
 # Eine Hauptfunktion erstellen, um die gesamte UI-Interaktion zu verarbeiten:
 def main():
+    # tkinter wird nur für die Benutzeroberfläche benötigt
+    import tkinter as tk
+    from tkinter import filedialog, ttk
+
+    # Definiere eine Klasse, die bei leerem Eingabefeld einen grauen Platzhaltertext anzeigt. Wenn das Eingabefeld den Fokus erh lt, verschwindet der Platzhaltertext. Wenn das Eingabefeld den Fokus verliert und leer ist, erscheint der Platzhaltertext wieder.
+    class PlaceholderEntry(ttk.Entry):
+        """Eingabefeld mit grauem Platzhaltertext, der bei Fokus verschwindet."""
+
+        def __init__(self, container, placeholder, *args, **kwargs):
+            super().__init__(container, *args, **kwargs, style='Placeholder.TEntry')
+            self.placeholder = placeholder
+            self.insert('0', self.placeholder)
+            self.bind('<FocusIn>', self._clear_placeholder)
+            self.bind('<FocusOut>', self._add_placeholder)
+            self.configure(foreground='grey')
+
+        def _clear_placeholder(self, e):
+            """Entfernt den Platzhalter bei Fokus."""
+            if self.get() == self.placeholder:
+                self.delete('0', 'end')
+                self.configure(foreground='white')
+
+        def _add_placeholder(self, e):
+            """Fügt den Platzhalter wieder ein, wenn das Feld leer ist."""
+            if not self.get():
+                self.insert('0', self.placeholder)
+                self.configure(foreground='grey')
+
+        def get_value(self):
+            """Gibt den aktuellen Wert zurück (leerer String falls nur Platzhalter)."""
+            return '' if self.get() == self.placeholder else self.get()
+
     # Konfiguration laden
     config = load_config()
 
@@ -161,13 +2082,24 @@ def main():
     orders_label = tk.Label(orders_frame, text="Orders limit:")
     orders_label.grid(row=0, column=0, sticky="w")
     
-    orders_entry = PlaceholderEntry(orders_frame, "z.B. 100")
+    orders_entry = PlaceholderEntry(orders_frame, "z.B. 100 (0 = alle)")
     if "orders_limit" in config and config["orders_limit"]:
         orders_entry.delete(0, 'end')
         orders_entry.insert(0, config["orders_limit"])
         orders_entry.configure(foreground='white')
     orders_entry.grid(row=0, column=1, sticky="ew", padx=(10, 0))
 
+    # Label und Eingabefeld für die Anzahl gleichzeitiger getOrder-Anfragen erstellen
+    workers_label = tk.Label(orders_frame, text="Parallel requests:")
+    workers_label.grid(row=1, column=0, sticky="w", pady=(10, 0))
+
+    workers_entry = PlaceholderEntry(orders_frame, f"z.B. {DEFAULT_MAX_WORKERS}")
+    if "max_workers" in config and config["max_workers"]:
+        workers_entry.delete(0, 'end')
+        workers_entry.insert(0, config["max_workers"])
+        workers_entry.configure(foreground='white')
+    workers_entry.grid(row=1, column=1, sticky="ew", padx=(10, 0), pady=(10, 0))
+
     # Label für "Ziel-Excel-Dateipfad" erstellen
     excel_label = tk.Label(frame, text="Target Excel file path:")
     excel_label.grid(row=4, column=0, sticky="w", padx=10, pady=10)
@@ -190,32 +2122,158 @@ def main():
         worksheet_entry.insert(0, config["worksheet_name"])
     worksheet_entry.grid(row=5, column=1, sticky="ew", padx=10, pady=10)
 
-    # Button zum Starten der Verarbeitung erstellen
-    # Die .strip()-Methode entfernt Leerzeichen am Anfang und Ende des Strings,
-    # einschließlich Leerzeichen, Tabulatoren und Zeilenumbrüchen
-    process_button = tk.Button(frame, text="Start processing",
-                               command=lambda: [
-                                    # Aktuelle Eingaben in der Konfiguration speichern
-                                    save_config({
-                                        "days": days_entry.get().strip(),
-                                        "orders_limit": orders_entry.get().strip(),
-                                        "excel_path": excel_entry.get().strip(),
-                                        "worksheet_name": worksheet_entry.get().strip(),
-                                    }),
-                                    # Informationsanzeige leeren
-                                    info_text.delete("1.0", tk.END),
-                                    # Verarbeitungsstart anzeigen
-                                    info_text.insert(tk.END, "Start processing... \n"),
-                                    # Funktion process_orders ausführen
-                                    process_orders(token_entry.get("1.0", tk.END).strip(),
-                                                              days_entry.get().strip(),
-                                                              orders_entry.get().strip(),
-                                                              excel_entry.get().strip(),
-                                                              worksheet_entry.get().strip()
-                                                              )
-                                ]
-                               )
-    process_button.grid(row=6, column=0, columnspan=2, padx=10, pady=10)
+    # Label für "Bestellnummern" erstellen (optional, zum gezielten erneuten Abrufen einzelner Bestellungen)
+    order_ids_label = tk.Label(frame, text="Order IDs (optional):")
+    order_ids_label.grid(row=6, column=0, sticky="w", padx=10, pady=10)
+    # Eingabefeld für die Bestellnummern erstellen (durch Komma oder Leerzeichen getrennt)
+    order_ids_entry = tk.Entry(frame)
+    order_ids_entry.grid(row=6, column=1, sticky="ew", padx=10, pady=10)
+
+    # Rahmen für zusätzliche Verarbeitungsoptionen erstellen
+    options_frame = tk.Frame(frame)
+    options_frame.grid(row=7, column=0, columnspan=2, sticky="w", padx=10, pady=0)
+
+    # Kontrollkästchen: Bestelldaten direkt aus der Bestellliste übernehmen und getOrder nur bei fehlenden Feldern aufrufen
+    summary_only_var = tk.BooleanVar(value=bool(config.get("summary_only", False)))
+    summary_only_check = tk.Checkbutton(options_frame, text="Summary only (skip getOrder)", variable=summary_only_var)
+    summary_only_check.grid(row=0, column=0, sticky="w")
+
+    # Kontrollkästchen: Nur seit der letzten Synchronisierung geänderte Bestellungen abrufen (lastModifiedDate)
+    incremental_var = tk.BooleanVar(value=bool(config.get("incremental", False)))
+    incremental_check = tk.Checkbutton(options_frame, text="Incremental sync", variable=incremental_var)
+    incremental_check.grid(row=0, column=1, sticky="w", padx=(10, 0))
+
+    # Kontrollkästchen: Zwischenspeicher für Bestelldetails umgehen und alle Details neu abrufen
+    bypass_cache_var = tk.BooleanVar(value=bool(config.get("bypass_cache", False)))
+    bypass_cache_check = tk.Checkbutton(options_frame, text="Bypass cache", variable=bypass_cache_var)
+    bypass_cache_check.grid(row=0, column=2, sticky="w", padx=(10, 0))
+
+    # Kontrollkästchen: Zeitraum in Zeitfenster aufteilen und diese gleichzeitig abrufen (für große historische Importe)
+    backfill_var = tk.BooleanVar(value=bool(config.get("backfill", False)))
+    backfill_check = tk.Checkbutton(options_frame, text="Backfill (parallel time windows)", variable=backfill_var)
+    backfill_check.grid(row=0, column=3, sticky="w", padx=(10, 0))
+
+    # Kontrollkästchen: Status bereits importierter Bestellungen abgleichen (z.B. nachträglich storniert)
+    update_status_var = tk.BooleanVar(value=bool(config.get("update_status", False)))
+    update_status_check = tk.Checkbutton(options_frame, text="Update status", variable=update_status_var)
+    update_status_check.grid(row=0, column=4, sticky="w", padx=(10, 0))
+
+    # Warteschlange für die Fortschrittsmeldungen des Verarbeitungsthreads
+    log_queue = queue.Queue()
+    worker_thread = None
+    cancel_event = None
+
+    def run_worker(args, kwargs):
+        """Führt process_orders im Verarbeitungsthread aus, unerwartete Fehler werden als Meldung ausgegeben"""
+        try:
+            process_orders(*args, **kwargs)
+        except Exception as e:
+            log_queue.put(f"\nFehler bei der Verarbeitung: {e}\n")
+
+    def start_processing():
+        """
+        Speichert die Eingaben und startet process_orders in einem eigenen Thread, damit das Fenster bedienbar bleibt.
+        Alle Eingaben werden hier im Tk-Hauptthread ausgelesen, der Verarbeitungsthread greift nicht auf Tk zu.
+        """
+        nonlocal worker_thread, cancel_event
+        if worker_thread is not None and worker_thread.is_alive():
+            return
+
+        # Aktuelle Eingaben in der Konfiguration speichern
+        # Vorhandene Schlüssel (neu eingelesen) beibehalten, damit nur in der Datei gepflegte Einstellungen
+        # und der Synchronisierungsstand nicht verloren gehen
+        save_config({
+            **load_config(),
+            "days": days_entry.get().strip(),
+            "orders_limit": orders_entry.get().strip(),
+            "max_workers": workers_entry.get_value().strip(),
+            "excel_path": excel_entry.get().strip(),
+            "worksheet_name": worksheet_entry.get().strip(),
+            "summary_only": summary_only_var.get(),
+            "incremental": incremental_var.get(),
+            "bypass_cache": bypass_cache_var.get(),
+            "backfill": backfill_var.get(),
+            "update_status": update_status_var.get(),
+        })
+        # Informationsanzeige leeren und Verarbeitungsstart anzeigen
+        log_view.clear()
+        log_view.append("Start processing... \n")
+
+        # Die .strip()-Methode entfernt Leerzeichen am Anfang und Ende des Strings,
+        # einschließlich Leerzeichen, Tabulatoren und Zeilenumbrüchen
+        cancel_event = threading.Event()
+        token = token_entry.get("1.0", tk.END).strip()
+        args = (token,
+                days_entry.get().strip(),
+                orders_entry.get().strip(),
+                excel_entry.get().strip(),
+                worksheet_entry.get().strip(),
+                workers_entry.get_value().strip())
+        kwargs = dict(
+            requests_per_second=config_number(config, "requests_per_second", DEFAULT_REQUESTS_PER_SECOND, float),
+            max_retries=config_number(config, "max_retries", DEFAULT_MAX_RETRIES),
+            summary_only=summary_only_var.get(),
+            order_ids=parse_order_ids(order_ids_entry.get()),
+            use_order_index=bool(config.get("order_index", True)),
+            incremental=incremental_var.get(),
+            watermark_overlap_minutes=config_number(config, "watermark_overlap_minutes", DEFAULT_WATERMARK_OVERLAP_MINUTES),
+            use_cache=not bypass_cache_var.get(),
+            cache_ttl_hours=config_number(config, "cache_ttl_hours", DEFAULT_CACHE_TTL_HOURS, float),
+            cache_max_mb=config_number(config, "cache_max_mb", DEFAULT_CACHE_MAX_MB, float),
+            metrics_json_file=config.get("metrics_json_file"),
+            metrics_prometheus_file=config.get("metrics_prometheus_file"),
+            # Ohne eingegebenes Token die Kontoprofile aus der Konfiguration verwenden
+            accounts=None if token else load_accounts(config),
+            output_path=config.get("output_path"),
+            backfill_window_days=config_number(config, "backfill_window_days", DEFAULT_BACKFILL_WINDOW_DAYS) if backfill_var.get() else 0,
+            backfill_parallel=config_number(config, "backfill_parallel", DEFAULT_BACKFILL_PARALLEL),
+            use_journal=bool(config.get("run_journal", True)),
+            journal_max_age_hours=config_number(config, "journal_max_age_hours", DEFAULT_JOURNAL_MAX_AGE_HOURS, float),
+            update_status=update_status_var.get(),
+            shard_monthly=bool(config.get("shard_monthly", False)),
+            aggregates=bool(config.get("aggregates", True)),
+            aggregates_summary=bool(config.get("aggregates_summary", False)),
+            sort_buffer_lines=config_number(config, "sort_buffer_lines", DEFAULT_SORT_BUFFER_LINES),
+            verbose=bool(config.get("verbose_console", False)),
+            log=log_queue.put,
+            cancel_event=cancel_event,
+        )
+
+        # Funktion process_orders im Verarbeitungsthread ausführen
+        worker_thread = threading.Thread(target=run_worker, args=(args, kwargs), daemon=True)
+        process_button.configure(state=tk.DISABLED)
+        cancel_button.configure(state=tk.NORMAL)
+        worker_thread.start()
+
+    def cancel_processing():
+        """Fordert den Abbruch der laufenden Verarbeitung an"""
+        if cancel_event is not None and worker_thread is not None and worker_thread.is_alive():
+            cancel_event.set()
+            cancel_button.configure(state=tk.DISABLED)
+            log_view.append("\nAbbruch angefordert...\n")
+
+    def drain_log_queue():
+        """Übernimmt die gesammelten Meldungen gebündelt in die Anzeige und gibt die Buttons nach Ende der Verarbeitung frei"""
+        messages = []
+        while len(messages) < LOG_BATCH_SIZE:
+            try:
+                messages.append(log_queue.get_nowait())
+            except queue.Empty:
+                break
+        if messages:
+            log_view.append("".join(messages))
+        if worker_thread is not None and not worker_thread.is_alive() and log_queue.empty():
+            process_button.configure(state=tk.NORMAL)
+            cancel_button.configure(state=tk.DISABLED)
+        root.after(LOG_POLL_MS, drain_log_queue)
+
+    # Buttons zum Starten und Abbrechen der Verarbeitung erstellen
+    buttons_frame = tk.Frame(frame)
+    buttons_frame.grid(row=8, column=0, columnspan=2, padx=10, pady=10)
+    process_button = tk.Button(buttons_frame, text="Start processing", command=start_processing)
+    process_button.grid(row=0, column=0, padx=(0, 10))
+    cancel_button = tk.Button(buttons_frame, text="Cancel", command=cancel_processing, state=tk.DISABLED)
+    cancel_button.grid(row=0, column=1)
 
     # Informationsanzeige erstellen
     info_frame = tk.Frame(root)
@@ -225,381 +2283,774 @@ def main():
     info_label.pack()
 
     # Einen Textbereich zur Anzeige von Informationen erstellen
-    global info_text
     info_text = tk.Text(info_frame, wrap=tk.WORD, width=width, height=height, borderwidth=2)
     info_text.pack(padx=10, pady=10)
 
+    # Die Anzeige ist auf eine maximale Zeilenanzahl begrenzt, optional werden alle Meldungen in eine Logdatei geschrieben
+    log_view = LogView(info_text, config_number(config, "log_max_lines", DEFAULT_LOG_MAX_LINES), config.get("log_file") or None)
+
     # Kontextmenü für Rechtsklick zum Kopieren des Textes aktivieren
     info_text.bind("<Button-3>", lambda event: info_text.event_generate('<Control-a>'))
     info_text.bind("<Control-a>", lambda event: info_text.event_generate('<Copy>'))
 
+    # Meldungen des Verarbeitungsthreads regelmäßig übernehmen
+    root.after(LOG_POLL_MS, drain_log_queue)
+
     # Hauptereignisschleife ausführen
     root.mainloop()
 
 # Funktion zur Verarbeitung von Bestellungen definieren
-def process_orders(token, days, orders_limit, excel_path, worksheet_name):
-
-    """Zuerst eine erste Überprüfung der eingegebenen Daten durchführen"""
-    # Überprüfen, ob die Anzahl der Bestellungstage und die Anzahl der zurückzugebenden Bestellungen leer sind
-    if not token or not days or not orders_limit or not excel_path or not worksheet_name:
-        info_text.insert(tk.END, "All input data cannot be empty.\n")
-        return
-
-    # Überprüfen, ob die Anzahl der Bestellungstage und die Anzahl der zurückzugebenden Bestellungen Ganzzahlen sind
-    if not days.isdigit() or not orders_limit.isdigit():
-        info_text.insert(tk.END, "Order days and orders limit must be integers.")
-        return
-
-    # Die Anzahl der Bestellungstage und die Anzahl der zurückzugebenden Bestellungen in Ganzzahlen umwandeln
-    days = int(days)
-    orders_limit = int(orders_limit)
-
-    # Versuchen, die Arbeitsmappe zu öffnen und zu überprüfen, ob die Excel-Datei und das Arbeitsblatt existieren
-    try:
-        workbook = openpyxl.load_workbook(excel_path)
-        sheet = workbook[worksheet_name]
-    except FileNotFoundError:
-        info_text.insert(tk.END, "The specified Excel file does not exist.\n")
-        return
-    except KeyError:
-        info_text.insert(tk.END, "The specified worksheet does not exist.\n")
-        return
-    except Exception as e:
-        info_text.insert(tk.END, f"Error opening Excel file: {str(e)}\n")
-        return
-
-    # Anfangsnachricht
-    info_text.insert(tk.END, f"Verarbeite Bestellungen der letzten {days} Tage...\n")
-
-    # Aktuelle Zeit als ISO 8601-formatierte Zeichenkette abrufen
-    current_time = datetime.now(timezone.utc).replace(microsecond=0)  # Aktuelle Zeit
-    past_24_hours = current_time - timedelta(hours=24)  # 24 Stunden zuvor
-    past_x_days = current_time - timedelta(days=days)  # Anzahl der Tage zuvor
-
-    # Zeit in das ISO 8601-Format umwandeln
-    current_time_str = current_time.strftime("%Y-%m-%dT%H:%M:%S.000Z")
-    past_24_hours_str = past_24_hours.strftime("%Y-%m-%dT%H:%M:%S.000Z")
-    past_x_days_str = past_x_days.strftime("%Y-%m-%dT%H:%M:%S.000Z")
-
-    # eBay API-Zugriffstoken festlegen
-    access_token = token
-
-    # API-Endpunkt zum Abrufen von Bestellungen definieren
-    url_get_orders = "https://api.ebay.com/sell/fulfillment/v1/order"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-
-    # Liste zum Speichern von Bestellinformationen definieren
-    orders_list = []
-
-    params_get_orders = {
-        "filter": f"creationdate:[{past_x_days_str}..{current_time_str}]",
-        "limit": orders_limit  # Anzahl der zurückzugebenden Bestellungen anpassen
-    }
-
-    # API-Anfrage zum Abrufen von Bestellungen senden
-    response_get_orders = requests.get(url_get_orders, headers=headers, params=params_get_orders)
-
-    # Alle Bestellungen mit getOrders abrufen
-    if response_get_orders.status_code == 200:
-        orders = response_get_orders.json().get("orders", [])
-        # print(orders) # Zum Debuggen: Bestellinformationen anzeigen
-
-        # Jede Bestellung mit getOrder durchlaufen
-        info_text.insert(tk.END, "\n=== Abgerufene Bestellungen ===\n")
-        console_output = []
-        
-        for index, order in enumerate(orders, 1):
-            order_id = order.get("orderId")
-            # Empfänger- und Adressinformationen der Bestellung abrufen
-            url_get_order = f"https://api.ebay.com/sell/fulfillment/v1/order/{order_id}"
-            response_get_order = requests.get(url_get_order, headers=headers)
-
-            if response_get_order.status_code == 200:
-                order_details = response_get_order.json()
-                order_info = f"{index}. Bestellnummer: {order_id}"
-                info_text.insert(tk.END, order_info + "\n")
-                console_output.append(order_info)
-                
-                # Bestelldetails verarbeiten
-                shipping_step = order_details.get('fulfillmentStartInstructions', [{}])[0].get('shippingStep', {})
-                ship_to = shipping_step.get('shipTo', {})
-                creationDate = order_details.get('creationDate', 'Nicht angegeben')
-                order_fulfillment_status = order_details.get('orderFulfillmentStatus', 'Nicht angegeben')
-                cancel_status = order_details.get('cancelStatus', {}).get('cancelState', 'Nicht angegeben')
-                full_name = ship_to.get('fullName', 'Nicht angegeben')
-                contact_address = ship_to.get('contactAddress', {})
-                Strasse1 = contact_address.get('addressLine1', 'Nicht angegeben')
-                Strasse2 = contact_address.get('addressLine2', '')
-                # Wenn Strasse2 leer ist, dann ist Strasse gleich Strasse1, ansonsten ist Strasse gleich Strasse1 + ' (' + Strasse2 + ')'
-                Strasse = Strasse1 if not Strasse2 else Strasse1 + ' (' + Strasse2 + ')'
-                city = contact_address.get('city', 'Nicht angegeben')
-                PLZ = contact_address.get('postalCode', 'Nicht angegeben')
-                phone_number_dict = ship_to.get('primaryPhone', {})
-                phone_number = phone_number_dict.get('phoneNumber', 'Nicht angegeben')
-                email = ship_to.get('email', 'Nicht angegeben')
-                buyer_username = order_details.get('buyer', {}).get('username', 'Nicht angegeben')  # Benutzername des Käufers abrufen
-
-                # Eine Bestellung kann mehrere Artikel enthalten, daher müssen die Artikelinformationen durchlaufen werden
-                item_info = order_details.get('lineItems', [{}])
-                for item in item_info:
-                    sku = item.get('sku', 'Nicht angegeben')
-                    quantity = item.get('quantity', 'Nicht angegeben')
-                    
-                    # Der von EBAY erhaltene Preis ist ein String und muss in einen Float-Typ umgewandelt werden, um mathematische Berechnungen durchführen zu können
-                    price_str = item.get('discountedLineItemCost', {}).get('value', 'Nicht angegeben')  # Rabattierter Preis
-                    price = float(price_str) if price_str != 'Nicht angegeben' and price_str is not None else 0.0
-
-                    # Bestellinformationen als Wörterbuch speichern
-                    order_info = {
-                        "order_id": order_id,
-                        "creationDate": creationDate,
-                        "order_fulfillment_status": order_fulfillment_status,
-                        "cancel_status": cancel_status,
-                        "full_name": full_name,
-                        "Strasse": Strasse,
-                        "city": city,
-                        "PLZ": PLZ,
-                        "phone_number": phone_number,
-                        "email": email,
-                        "buyer_username": buyer_username,  # Benutzername des Käufers hinzufügen
-                        "sku": sku,
-                        "quantity": quantity,
-                        "price": price
-                    }
-
-                    # Bestellinformationen-Wörterbuch zur Liste hinzufügen
-                    orders_list.append(order_info)
-
-            else:
-                print(f"Fehler beim Abrufen der Bestellung {order_id}, Statuscode: {response_get_order.status_code}")
-                info_text.insert(tk.END, f"Fehler beim Abrufen der Bestellung {order_id}, Statuscode: {response_get_order.status_code}\n")
-    else:
-        print(f"Fehler beim Abrufen der Bestellliste, Statuscode: {response_get_orders.status_code}")
-        info_text.insert(tk.END, f"Fehler beim Abrufen der Bestellliste, Statuscode: {response_get_orders.status_code}\n")
-
-    # Bestellinformationen in der Konsole und UI anzeigen (bereits oben in der Funktion erfolgt)
-    # Hier keine zusätzliche Ausgabe mehr, um Duplikate zu vermeiden
-
+def process_orders(token, days, orders_limit, excel_path, worksheet_name, max_workers="",
+                   requests_per_second=DEFAULT_REQUESTS_PER_SECOND, max_retries=DEFAULT_MAX_RETRIES, session=None,
+                   summary_only=False, order_ids=None, use_order_index=True, incremental=False,
+                   watermark_overlap_minutes=DEFAULT_WATERMARK_OVERLAP_MINUTES, use_cache=True,
+                   cache_ttl_hours=DEFAULT_CACHE_TTL_HOURS, cache_max_mb=DEFAULT_CACHE_MAX_MB, log=None, cancel_event=None,
+                   cache=None, sku_rules=None, metrics_json_file=None, metrics_prometheus_file=None, accounts=None,
+                   output_path=None, backfill_window_days=0, backfill_parallel=DEFAULT_BACKFILL_PARALLEL, use_journal=True,
+                   journal_max_age_hours=DEFAULT_JOURNAL_MAX_AGE_HOURS, update_status=False, shard_monthly=False,
+                   aggregates=True, aggregates_summary=False, sort_buffer_lines=DEFAULT_SORT_BUFFER_LINES, verbose=False):
     """
-    2. Die erhaltene Informationsliste weiterverarbeiten, zuerst stornierte Bestellungen entfernen, dann nach Datum von der ältesten zur neuesten sortieren
+    Verarbeitet die Bestellungen und schreibt neue Bestellzeilen in die Excel-Datei.
+    Fortschrittsmeldungen werden an log übergeben (ohne Angabe auf der Konsole ausgegeben), damit die Funktion
+    auch außerhalb des Tk-Hauptthreads laufen kann. Ist cancel_event gesetzt, wird die Verarbeitung vor der nächsten
+    Seite bzw. vor dem Schreiben abgebrochen, ohne die Excel-Datei zu verändern.
+    Eine übergebene Verbindung (session) bzw. ein übergebener Zwischenspeicher (cache) wird nicht geschlossen,
+    sodass sie über mehrere Läufe hinweg wiederverwendet werden können. Ohne sku_rules werden die Regeln aus der
+    Regeldatei geladen.
+    Die Laufzeit jeder Stufe sowie Anfragen, Wiederholungen, empfangene Bytes und geschriebene Zeilen werden gemessen,
+    am Ende des Laufs angezeigt und optional als JSON bzw. Prometheus-Textfile exportiert.
+    Mit accounts (Kontoprofile aus load_accounts) werden mehrere Konten gleichzeitig abgerufen, zusammengeführt und
+    gemeinsam in einem Speichervorgang geschrieben; token und session werden dann nicht verwendet.
+    Mit output_path werden die neuen Bestellzeilen statt in die Arbeitsmappe in eine CSV-, SQLite- oder neue XLSX-Datei
+    gestreamt (Format nach Dateiendung, siehe open_sink); die Arbeitsmappe ist dann optional und dient nur dem Abgleich.
+    Mit backfill_window_days wird der Zeitraum in Zeitfenster dieser Länge aufgeteilt, von denen bis zu backfill_parallel
+    pro Konto gleichzeitig abgerufen werden (das Bestelllimit gilt dann pro Zeitfenster, inkrementell wird nicht synchronisiert).
+    Mit use_journal werden abgerufene Bestellungen im Laufjournal (siehe RunJournal) gesichert; ein abgebrochener Lauf
+    mit denselben Parametern wird innerhalb von journal_max_age_hours fortgesetzt statt neu begonnen.
+    Mit update_status wird bei abgerufenen Bestellungen, die bereits in der Arbeitsmappe stehen und deren Versand- oder
+    Stornierungsstatus sich geändert hat, der neue Status in Spalte R ihrer Zeilen eingetragen (siehe find_status_changes);
+    neue Zeilen erhalten dort ihren Anfangsstatus.
+    Mit shard_monthly werden neue Bestellzeilen statt in die Arbeitsmappe in Monatsarbeitsmappen neben ihr geschrieben
+    (siehe write_orders_to_shards); die Arbeitsmappe selbst muss dann nicht existieren.
+    Mit aggregates werden die neu geschriebenen Zeilen nach erfolgreichem Schreiben zu den Verkaufssummen pro SKU und
+    Tag bzw. Monat addiert (siehe SalesAggregates), mit aggregates_summary zusätzlich eine Übersichtsarbeitsmappe geschrieben.
+    Die Bestellzeilen durchlaufen die Verarbeitung als verkettete Generatoren; zum Sortieren werden insgesamt höchstens
+    sort_buffer_lines Zeilen im Speicher gehalten (siehe LineSpool). Mit verbose werden die Bestelllisten zusätzlich
+    vollständig auf der Konsole ausgegeben.
+    Gibt True zurück, wenn der Lauf vollständig durchgeführt wurde, sonst False.
     """
-
-    # Eine neue Liste definieren, um nicht stornierte Bestellinformationen zu speichern
-    uncanceled_orders_list = []
-
-    # 迭代订单信息列表
-    for order_info in orders_list:
-        # Überprüfen, ob der Stornierungsstatus der Bestellung "CANCELED" ist
-        if order_info["cancel_status"] != "CANCELED":
-            # Wenn nicht "CANCELED", die Bestellinformationen zur neuen Liste hinzufügen
-            uncanceled_orders_list.append(order_info)
-
-    # Gefilterte Liste der Bestellinformationen    # Gefilterte Bestellungen ausgeben
-    print("Bereinigte Bestellliste (stornierte Bestellungen wurden entfernt):")
-    for order_info in uncanceled_orders_list:
-        print(order_info)
-    print()  # Leerzeile zur besseren Lesbarkeit
-
-    # Eine Funktion definieren, um das Erstellungsdatum einer Bestellung für die Sortierung zu erhalten
-    def get_creation_date(order_info):
-        return order_info["creationDate"]
-
-    # Die Liste der nicht stornierten Bestellungen nach Erstellungsdatum von der ältesten zur neuesten sortieren
-    sorted_uncanceled_orders_list = sorted(uncanceled_orders_list, key=get_creation_date)
-
-    # Durch die sortierte Bestellliste iterieren, nur das Datum ohne Uhrzeit behalten, da es sonst zu Formatfehlern beim Schreiben in die Excel-Tabelle kommt
-    for order_info in sorted_uncanceled_orders_list:
-        order_info["creationDate"] = order_info["creationDate"][:10]  # Nur das Datum behalten
-
-    # Sortierte Liste der Bestellinformationen    # Sortierte Bestellungen ausgeben
-    print("Nach Datum sortierte Bestellungen (älteste zuerst):")
-    for order_info in sorted_uncanceled_orders_list:
-        print(order_info)
-    print()  # Leerzeile zur besseren Lesbarkeit
-
-    """
-    Drei. jetzt müssen wir weiterverarbeiten, um zu prüfen, ob es sich um eine Dusche HLMR, DR, DBL oder CL handelt
-    1. Teile die SKU in drei Teile auf: Buchstaben, erste zwei Ziffern, letzte zwei Ziffern
-    2. Überprüfe, ob der Buchstabe in der Liste enthalten ist, die ersten beiden Ziffern und die letzten beiden Ziffern sind identisch
-{{ ... }}
-    4. Wenn der Buchstabe HLMR, DR, DBL oder CL ist, aber die ersten beiden Ziffern und die letzten beiden Ziffern nicht identisch sind, dann teile die Zeile in zwei Zeilen auf, eine Zeile mit der SKU Buchstabe + erste zwei Ziffern, die andere Zeile mit der SKU Buchstabe + letzte zwei Ziffern, Preis ändere in 0
-    """
-
-    # Neue Liste für die verarbeiteten Bestellungen erstellen
-    processed_orders_list = []
-
-    # 迭代订单信息列表
-    for order_info in sorted_uncanceled_orders_list:
-        sku = order_info["sku"]
-        if sku:
-
-            # Zuerst prüfen, ob die SKU mit 'NF' endet
-            if sku.endswith('NF'):
-                # Erste Zeile: Ursprüngliche SKU behalten (ohne 'NF')
-                first_order = order_info.copy()
-                first_order["sku"] = sku[:-2]  # 'NF' entfernen
-                processed_orders_list.append(first_order)
-                
-                # Zweite Zeile: WA30H verwenden
-                second_order = order_info.copy()
-                second_order["sku"] = "DWR30"
-                second_order["price"] = 0  # Preis auf 0 setzen
-                processed_orders_list.append(second_order)
-
-            # Wenn nicht mit 'NF' endend, die ursprüngliche Logik ausführen
-            # Prüfen, ob die SKU die Bedingung erfüllt: Nach dem viertletzten Zeichen nur Buchstaben, dritt- und viertletzte Ziffern, letzte zwei Ziffern
-            elif sku[:-4].isalpha() and sku[-4:-2].isdigit() and sku[-2:].isdigit():
-                # SKU in drei Teile aufteilen
-                letters = sku[:-4]
-                first_two_digits = sku[
-                                   -4:-2]  # Extrahiert die Zeichen an Position -4 und -3 (exklusive -2)
-                last_two_digits = sku[-2:]
-
-                # Wenn first_two_digits 10, 11 oder 12 ist, eine Null anhängen
-                if first_two_digits in ['10', '11', '12']:
-                    first_two_digits = first_two_digits + '0'
-
-                # Wenn last_two_digits 10, 11 oder 12 ist, eine Null anhängen
-                if last_two_digits in ['10', '11', '12']:
-                    last_two_digits = last_two_digits + '0'
-
-                # Prüfen, ob die Buchstaben in der angegebenen Liste sind und ob die ersten beiden Ziffern mit den letzten beiden übereinstimmen
-                if letters in ["HLMR", "DR", "CL", "DBL"]:
-
-                    if first_two_digits == last_two_digits:
-                        # Bestellinformationen anpassen
-                        order_info["sku"] = letters + first_two_digits
-                        order_info["quantity"] = 2 * order_info["quantity"]  # Menge verdoppeln
-                        processed_orders_list.append(order_info.copy())
-
-                    else:
-                        # In zwei Zeilen verarbeiten
-                        order_info["sku"] = letters + first_two_digits
-                        processed_orders_list.append(order_info.copy())  # Erste Zeile hinzufügen
-                        order_info["sku"] = letters + last_two_digits
-                        order_info["price"] = 0  # Preis auf 0 setzen
-                        processed_orders_list.append(order_info.copy())  # Zweite Zeile hinzufügen
-
-                else:
-                    # Wenn der Typ nicht einer der 4 Typen ist, unverändert lassen
-                    processed_orders_list.append(order_info)
-
-            else:
-                # Wenn die SKU die Bedingungen nicht erfüllt, Bestellinformationen unverändert lassen
-                processed_orders_list.append(order_info)
+    if log is None:
+        log = lambda text: print(text, end="")
+
+    def is_cancelled():
+        return cancel_event is not None and cancel_event.is_set()
+
+    metrics = RunMetrics()
+
+    def finish(success):
+        """Übernimmt die Zähler der Verbindung, zeigt die Laufzeitmessung an, exportiert sie und gibt success zurück"""
+        for account_session, stats_before in zip(sessions, session_stats):
+            for key, value in account_session.stats.items():
+                metrics.count(key, value - stats_before[key])
+        metrics.success = success
+        log("\n\n=== Laufzeit ===\n")
+        for line in metrics.summary_lines():
+            log(line + "\n")
+        try:
+            metrics.export(metrics_json_file, metrics_prometheus_file)
+        except OSError as e:
+            log(f"Fehler beim Exportieren der Metriken: {e}\n")
+        return success
+
+    # Verbindungen, deren Zähler finish übernimmt (werden beim Abruf festgelegt)
+    sessions = []
+    session_stats = []
+    try:
+        """Zuerst eine erste Überprüfung der eingegebenen Daten durchführen"""
+        # Werden bestimmte Bestellnummern abgerufen, sind die Anzahl der Bestellungstage und der Bestellungen nicht erforderlich
+        if order_ids:
+            days = days or "0"
+            orders_limit = orders_limit or "0"
+
+        # Ohne Kontoprofile ein einzelnes Konto mit dem eingegebenen Token und dem Standardstandort verwenden
+        if accounts:
+            session = None
         else:
-            # Wenn keine SKU vorhanden ist, Bestellinformationen unverändert lassen
-            processed_orders_list.append(order_info)
-
-    # Funktion zum Laden der Excel-Tabelle und Rückgabe der Bestellnummern
-    def load_order_ids_from_excel(file_path, sheet_name):  # Parameter: Excel-Dateipfad und Arbeitsblattname
+            accounts = [{"name": "", "token": token, "marketplace": None, "location": DEFAULT_LOCATION}]
+
+        # Überprüfen, ob die Anzahl der Bestellungstage und die Anzahl der zurückzugebenden Bestellungen leer sind
+        if (not all(account["token"] for account in accounts) or not days or not orders_limit
+                or (not output_path and (not excel_path or not worksheet_name))):
+            log("All input data cannot be empty.\n")
+            return False
+
+        # Überprüfen, ob die Anzahl der Bestellungstage und die Anzahl der zurückzugebenden Bestellungen Ganzzahlen sind
+        if not days.isdigit() or not orders_limit.isdigit():
+            log("Order days and orders limit must be integers.")
+            return False
+
+        # Die Anzahl gleichzeitiger Anfragen ist optional, ohne Angabe wird der Standardwert verwendet
+        max_workers = str(max_workers).strip()
+        if max_workers and (not max_workers.isdigit() or int(max_workers) < 1):
+            log("Parallel requests must be a positive integer.\n")
+            return False
+
+        # Die Anzahl der Bestellungstage und die Anzahl der zurückzugebenden Bestellungen in Ganzzahlen umwandeln
+        days = int(days)
+        orders_limit = int(orders_limit)
+        max_workers = int(max_workers) if max_workers else DEFAULT_MAX_WORKERS
+
+        # Ausgabe anhand der Dateiendung wählen
+        sink = None
+        if output_path:
+            try:
+                sink = open_sink(output_path)
+            except ValueError as e:
+                log(f"{e}\n")
+                return False
+
+        # Monatsarbeitsmappen ersetzen nur die Arbeitsmappe, nicht eine gewählte Ausgabe
+        shard_monthly = shard_monthly and sink is None
+
+        # Der Statusabgleich ändert vorhandene Zeilen und ist daher nur beim Schreiben in die Arbeitsmappe möglich
+        if update_status and (sink is not None or shard_monthly):
+            log("Statusabgleich ist nur beim Schreiben in die Arbeitsmappe möglich und wird übersprungen.\n")
+            update_status = False
+
+        # Versuchen, die Arbeitsmappe zu öffnen und zu überprüfen, ob die Excel-Datei und das Arbeitsblatt existieren.
+        # Ist der Bestellindex aktuell, muss die Arbeitsmappe dafür nicht geöffnet werden, sonst wird der Index
+        # bzw. ohne Index die Menge der vorhandenen Bestellnummern im selben schreibgeschützten Durchlauf eingelesen
+        # (beim Statusabgleich zusammen mit den Zeilennummern und dem Status jeder Bestellung)
+        # Mit Monatsarbeitsmappen wird stattdessen nur das Manifest geöffnet
+        # Bei einer Ausgabe werden zusätzlich die bereits exportierten Bestellnummern abgeglichen
+        order_index = None
+        manifest = None
+        export_index = None
+        excel_order_ids = set()
+        excel_order_rows = {}
         try:
-            workbook = openpyxl.load_workbook(file_path)
-            sheet = workbook[sheet_name]
-            order_ids = set()
-            for row in sheet.iter_rows(min_row=2, max_col=8, max_row=sheet.max_row, values_only=True):
-                if row and len(row) > 7 and row[7]:  # Überprüfen, ob die Zeile und Spalte H existieren
-                    order_ids.add(str(row[7]))
-            return order_ids
+            # Bei einer Ausgabe ohne Arbeitsmappe entfällt der Abgleich mit vorhandenen Bestellungen
+            with metrics.stage("dedup"):
+                if sink is not None:
+                    export_index = ExportIndex(get_order_index_path(), output_path, sink)
+                if shard_monthly:
+                    manifest = ShardManifest(excel_path)
+                elif excel_path and worksheet_name:
+                    if use_order_index:
+                        order_index = open_order_index(excel_path, worksheet_name)
+                    if order_index is None and update_status:
+                        excel_order_rows = load_order_rows_from_excel(excel_path, worksheet_name)
+                        excel_order_ids = set(excel_order_rows)
+                    elif order_index is None:
+                        excel_order_ids = load_order_ids_from_excel(excel_path, worksheet_name)
+        except FileNotFoundError:
+            log("The specified Excel file does not exist.\n")
+            return False
+        except KeyError:
+            log("The specified worksheet does not exist.\n")
+            return False
+        except sqlite3.Error as e:
+            log(f"Fehler beim Öffnen des Index: {e}\n")
+            return False
         except Exception as e:
-            info_text.insert(tk.END, f"Fehler beim Lesen der Excel-Datei: {str(e)}\n")
-            return set()
-
-    # Excel-Datei laden und Bestellnummern abrufen
-    excel_order_ids = load_order_ids_from_excel(excel_path, worksheet_name)
-
-    # Statistik-Informationen
-    total_orders = len(orders)  # Gesamtzahl der Bestellungen aus der API-Antwort
-    uncanceled_orders = len(uncanceled_orders_list)  # Anzahl der nicht stornierten Bestellungen
-    cancelled_orders = total_orders - uncanceled_orders  # Anzahl der stornierten Bestellungen
-
-    # Bereits in der Excel-Tabelle vorhandene Bestellungen aus processed_orders_list entfernen
-    processed_orders_list = [order for order in processed_orders_list if order['order_id'] not in excel_order_ids]
-
-    # Doppelte und neue Bestellungen zählen
-    all_order_ids = set(order['order_id'] for order in uncanceled_orders_list)  # 所有未取消的订单ID
-    existing_orders_in_excel = len(excel_order_ids)  # Excel中已存在的订单总数
+            log(f"Error opening Excel file: {str(e)}\n")
+            return False
+
+        # Im Backfill-Modus wird der Erstellungszeitraum in Zeitfenster aufgeteilt, die gleichzeitig abgerufen werden
+        backfill = backfill_window_days > 0 and not order_ids
+        if backfill:
+            incremental = False
+
+        # Im inkrementellen Modus den zuletzt gesehenen lastModifiedDate jedes Kontos aus der Konfiguration lesen
+        config = load_config() if incremental and not order_ids else {}
+        watermarks = [config.get(ACCOUNT_WATERMARKS_KEY, {}).get(account["name"]) if account["name"]
+                      else config.get(WATERMARK_KEY) for account in accounts]
+
+        # Anfangsnachricht
+        if len(accounts) > 1:
+            log(f"Konten: {', '.join(account['name'] for account in accounts)}\n")
+        if order_ids:
+            log(f"Aktualisiere {len(order_ids)} Bestellungen anhand der Bestellnummern...\n")
+        elif any(watermarks):
+            log(f"Verarbeite Bestellungen, die seit {min(watermark for watermark in watermarks if watermark)} geändert wurden...\n")
+        else:
+            log(f"Verarbeite Bestellungen der letzten {days} Tage...\n")
+
+        # Aktuelle Zeit als ISO 8601-formatierte Zeichenkette abrufen
+        current_time = datetime.now(timezone.utc).replace(microsecond=0)  # Aktuelle Zeit
+        past_24_hours = current_time - timedelta(hours=24)  # 24 Stunden zuvor
+        past_x_days = current_time - timedelta(days=days)  # Anzahl der Tage zuvor
+
+        # Zeit in das ISO 8601-Format umwandeln
+        current_time_str = current_time.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        past_24_hours_str = past_24_hours.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        past_x_days_str = past_x_days.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+        # Eine HTTP-Verbindung pro Konto für alle Anfragen dieses Laufs erstellen, sofern der Aufrufer
+        # für das einzelne Konto keine bestehende Verbindung übergibt
+        # Im Backfill-Modus teilen sich mehrere Zeitfenster eine Verbindung, der Verbindungspool wird entsprechend vergrößert
+        parallel_per_account = max(1, backfill_parallel) if backfill else 1
+        own_session = session is None
+        if own_session:
+            sessions = [ApiSession(account["token"], max_workers * parallel_per_account, requests_per_second, max_retries,
+                                   account["marketplace"], list_streams=parallel_per_account)
+                        for account in accounts]
+        else:
+            sessions = [session]
+        session_stats = [dict(account_session.stats) for account_session in sessions]
+
+        # Lokalen Zwischenspeicher für Bestelldetails öffnen. Wird er umgangen, werden die Details neu abgerufen
+        # und der Zwischenspeicher nur aktualisiert
+        own_cache = cache is None
+        if own_cache:
+            try:
+                cache = ResponseCache(get_response_cache_path(), cache_ttl_hours * 3600, cache_max_mb * 1024 * 1024, read=use_cache)
+            except sqlite3.Error as e:
+                print(f"Fehler beim Öffnen des Zwischenspeichers: {e}")
+                cache = None
+
+        # Laufjournal öffnen. Ein Lauf mit denselben Parametern, der nicht abgeschlossen wurde, wird fortgesetzt
+        journal = None
+        if use_journal:
+            run_key = build_run_key(excel_path, worksheet_name, output_path, [account["name"] for account in accounts],
+                                    order_ids, days, orders_limit, incremental, watermarks, backfill_window_days, summary_only,
+                                    update_status, shard_monthly)
+            try:
+                journal = RunJournal(get_run_journal_path(), run_key, journal_max_age_hours * 3600)
+            except sqlite3.Error as e:
+                print(f"Fehler beim Öffnen des Laufjournals: {e}")
+            else:
+                if journal.resumed_orders:
+                    log(f"Setze unterbrochenen Lauf fort ({journal.resumed_orders} Bestellungen bereits abgerufen)\n")
+
+        # Abrufaufträge: einer pro Konto bzw. im Backfill-Modus einer pro Konto und Zeitfenster. Der Filter gilt für den
+        # Erstellungszeitraum der Bestellungen bzw. im inkrementellen Modus für den Änderungszeitraum
+        tasks = []
+        if backfill:
+            windows = build_time_windows(past_x_days, current_time, backfill_window_days)
+            log(f"Backfill: {len(windows)} Zeitfenster zu {backfill_window_days} Tagen, "
+                f"bis zu {parallel_per_account} gleichzeitig pro Konto\n")
+        for account, account_session, watermark in zip(accounts, sessions, watermarks):
+            if backfill:
+                for window_start, window_end in windows:
+                    label = " ".join(filter(None, (account["name"], f"{window_start:%d.%m.%Y}-{window_end:%d.%m.%Y}")))
+                    tasks.append((account, account_session, build_creation_date_filter(window_start, window_end), label))
+            elif watermark:
+                tasks.append((account, account_session, build_incremental_filter(watermark, watermark_overlap_minutes), None))
+            else:
+                tasks.append((account, account_session, f"creationdate:[{past_x_days_str}..{current_time_str}]", None))
+
+        # Die Bestellzeilen jedes Auftrags werden in einem eigenen LineSpool gesammelt, der Sortierpuffer wird auf die
+        # Aufträge aufgeteilt, sodass der Speicherbedarf auch bei vielen Zeitfenstern höchstens sort_buffer_lines beträgt.
+        # Ebenso werden die ausgelagerten Läufe aufgeteilt, beim Zusammenführen aller Aufträge sind damit höchstens
+        # LineSpool.MAX_RUNS (bei mehr Aufträgen ein Lauf pro Auftrag) Dateien mit je einem Block geöffnet
+        spool_lines = max(1, sort_buffer_lines // max(1, len(tasks)))
+        spool_runs = max(1, LineSpool.MAX_RUNS // max(1, len(tasks)))
+
+        def fetch_task(task):
+            account, account_session, filter_get_orders, label = task
+            result = fetch_account_orders(account, account_session, filter_get_orders, orders_limit, order_ids, max_workers,
+                                          summary_only, cache, log, is_cancelled, metrics, label, journal,
+                                          LineSpool(spool_lines, spool_runs))
+            # Fortschritt jedes Zeitfensters einzeln melden
+            if backfill:
+                log(f"[{label}] abgeschlossen: {result[1]} Bestellungen\n")
+            return result
+
+        # Alle Aufträge gleichzeitig abrufen, die Laufzeit entspricht damit etwa der des langsamsten Kontos bzw. Zeitfensters
+        # Wurden im unterbrochenen Lauf bereits alle Bestellungen abgerufen, wird nur das Schreiben wiederholt
+        log("\n=== Abgerufene Bestellungen ===\n")
+        try:
+            if journal is not None and journal.resumed_state == "fetched":
+                log("Alle Bestellungen wurden bereits abgerufen, das Schreiben wird wiederholt.\n")
+                journal_spool = LineSpool(sort_buffer_lines)
+                journal_spool.extend(journal.iter_lines())
+                journal_order_ids = journal.order_ids()
+                task_results = [(journal_spool, len(journal_order_ids), journal_order_ids, None, True)]
+            else:
+                # Ein Thread-Pool pro Konto, damit jedes Konto höchstens parallel_per_account Zeitfenster gleichzeitig abruft
+                # und kein Konto auf die Zeitfenster eines anderen warten muss
+                with contextlib.ExitStack() as stack:
+                    executors = {id(account): stack.enter_context(ThreadPoolExecutor(max_workers=parallel_per_account))
+                                 for account in accounts}
+                    futures = [executors[id(task[0])].submit(fetch_task, task) for task in tasks]
+                    task_results = [future.result() for future in futures]
+                if journal is not None and not is_cancelled() and all(fetch_complete for *_, fetch_complete in task_results):
+                    journal.set_state("fetched")
+        except BaseException:
+            if journal is not None:
+                journal.close()
+            raise
+        finally:
+            if own_session:
+                for account_session in sessions:
+                    account_session.close()
+            if cache is not None:
+                cache.prune()
+                if own_cache:
+                    cache.close()
+
+        # Bestellzeilen aller Aufträge werden nicht in einer Liste zusammengeführt, sondern bei jedem Durchgang aus den
+        # LineSpools gelesen. Bestellungen, die bereits über ein anderes Konto bzw. Zeitfenster (Fenstergrenze) abgerufen
+        # wurden, werden dabei nur einmal übernommen
+        spools = [order_lines for order_lines, *_ in task_results]
+        spool_duplicates = []
+        total_orders = 0
+        found_order_ids = set()
+        for order_lines, account_orders, account_found_ids, new_watermark, fetch_complete in task_results:
+            duplicate_ids = account_found_ids & found_order_ids
+            spool_duplicates.append(duplicate_ids)
+            total_orders += account_orders - len(duplicate_ids)
+            found_order_ids |= account_found_ids
+
+        def iter_fetched_lines(ordered=False):
+            """Liefert die Bestellzeilen aller Aufträge ohne Duplikate, mit ordered nach Erstellungszeitpunkt sortiert"""
+            streams = []
+            for spool, duplicate_ids in zip(spools, spool_duplicates):
+                stream = spool.sorted_lines() if ordered else iter(spool)
+                streams.append(skip_order_ids(stream, duplicate_ids) if duplicate_ids else stream)
+            if ordered:
+                # Bei gleichem Zeitpunkt bleibt die Reihenfolge der Aufträge erhalten (stabil wie list.sort)
+                return heapq.merge(*streams, key=attrgetter("creationDate"))
+            return itertools.chain.from_iterable(streams)
+
+        def close_spools():
+            for spool in spools:
+                if isinstance(spool, LineSpool):
+                    spool.close()
+
+        # Bestellnummern melden, die von eBay nicht zurückgegeben wurden
+        if all(fetch_complete for *_, fetch_complete in task_results):
+            for order_id in order_ids or []:
+                if order_id not in found_order_ids:
+                    print(f"Bestellung {order_id} nicht gefunden")
+                    log(f"Bestellung {order_id} nicht gefunden\n")
+
+        # Bei Abbruch nichts weiter verarbeiten und die Excel-Datei unverändert lassen
+        if is_cancelled():
+            log("\nVerarbeitung abgebrochen, Excel-Datei unverändert.\n")
+            if order_index is not None:
+                order_index.close()
+            if manifest is not None:
+                manifest.close()
+            if export_index is not None:
+                export_index.close()
+            if journal is not None:
+                journal.close()
+            close_spools()
+            return finish(False)
+
+        # Bestellinformationen in der Konsole und UI anzeigen (bereits oben in der Funktion erfolgt)
+        # Hier keine zusätzliche Ausgabe mehr, um Duplikate zu vermeiden
+
+        """
+        2. Die erhaltene Informationsliste weiterverarbeiten, zuerst stornierte Bestellungen entfernen, dann nach Datum von der ältesten zur neuesten sortieren
+        """
+
+        # Nicht stornierte Bestellzeilen in einem Durchgang zählen (ausführliche Ausgabe: auf der Konsole anzeigen)
+        with metrics.stage("filter"):
+            if verbose:
+                print("Bereinigte Bestellliste (stornierte Bestellungen wurden entfernt):")
+            order_line_count = 0
+            uncanceled_orders = 0  # Anzahl der nicht stornierten Bestellzeilen
+            all_order_ids = set()  # 所有未取消的订单ID
+            for order_info in iter_fetched_lines():
+                order_line_count += 1
+                if order_info.cancel_status != "CANCELED":
+                    uncanceled_orders += 1
+                    all_order_ids.add(order_info.order_id)
+                    if verbose:
+                        print(order_info)
+            if verbose:
+                print()  # Leerzeile zur besseren Lesbarkeit
+
+        """
+        Drei. jetzt müssen wir weiterverarbeiten, um zu prüfen, ob es sich um eine Dusche HLMR, DR, DBL oder CL handelt
+        (Präfixe, Suffixe und Ziffernzuordnung stehen in der Regeldatei sku_rules.json, siehe SkuRules)
+        1. Teile die SKU in drei Teile auf: Buchstaben, erste zwei Ziffern, letzte zwei Ziffern
+        2. Überprüfe, ob der Buchstabe in der Liste enthalten ist, die ersten beiden Ziffern und die letzten beiden Ziffern sind identisch
+    {{ ... }}
+        4. Wenn der Buchstabe HLMR, DR, DBL oder CL ist, aber die ersten beiden Ziffern und die letzten beiden Ziffern nicht identisch sind, dann teile die Zeile in zwei Zeilen auf, eine Zeile mit der SKU Buchstabe + erste zwei Ziffern, die andere Zeile mit der SKU Buchstabe + letzte zwei Ziffern, Preis ändere in 0
+        """
+
+        # Mit Bestellindex nur die abgerufenen Bestellnummern im Index nachschlagen, beim Statusabgleich mit ihren Zeilen
+        with metrics.stage("dedup"):
+            if order_index is not None and update_status:
+                excel_order_rows = order_index.order_rows(found_order_ids)
+                excel_order_ids = set(excel_order_rows)
+            elif order_index is not None:
+                excel_order_ids = order_index.existing_order_ids(found_order_ids)
+            elif manifest is not None:
+                excel_order_ids = manifest.existing_order_ids(iter_fetched_lines())
+                # Bestellungen bis zum Beginn der Monatsarbeitsmappen können noch in der bisherigen Arbeitsmappe stehen,
+                # sie wird abgeglichen, solange der Abrufzeitraum nicht vollständig vom Manifest abgedeckt ist
+                earliest = min((line.creationDate[:10] for line in iter_fetched_lines()), default=None)
+                if earliest is not None and earliest <= manifest.since and os.path.exists(excel_path):
+                    try:
+                        workbook_index = open_order_index(excel_path, worksheet_name) if use_order_index else None
+                        if workbook_index is not None:
+                            try:
+                                excel_order_ids = excel_order_ids | workbook_index.existing_order_ids(found_order_ids)
+                            finally:
+                                workbook_index.close()
+                        else:
+                            excel_order_ids = excel_order_ids | load_order_ids_from_excel(excel_path, worksheet_name)
+                    except KeyError:
+                        log("Das Arbeitsblatt existiert in der bisherigen Arbeitsmappe nicht, es wird nur das Manifest abgeglichen.\n")
+            if export_index is not None:
+                excel_order_ids = excel_order_ids | export_index.existing_order_ids(found_order_ids)
+            # Vorhandene Bestellungen, deren Status sich geändert hat (auch nachträglich stornierte)
+            status_changes = find_status_changes(iter_fetched_lines(), excel_order_rows) if update_status else {}
+
+        # Verarbeitungskette als verkettete Generatoren: sortiert lesen -> stornierte entfernen -> nur Datum behalten
+        # -> SKU-Regeln -> bereits vorhandene Bestellungen entfernen. Die Zeilen werden erst beim Schreiben erzeugt,
+        # nur die Sortierung benötigt den begrenzten Puffer der LineSpools. Jede Stufe wird mit timed_iter gemessen,
+        # ihre Zeit wird damit unabhängig von der Ausgabe, die die Kette durchläuft, der richtigen Stufe zugeordnet
+        if sku_rules is None:
+            sku_rules = SkuRules(load_sku_rules())
+        sorted_orders = metrics.timed_iter("sort", iter_fetched_lines(ordered=True))
+        sorted_uncanceled_orders = truncate_creation_dates(
+            order_info for order_info in sorted_orders if order_info.cancel_status != "CANCELED")
+        if verbose:
+            sorted_uncanceled_orders = print_lines(sorted_uncanceled_orders, "Nach Datum sortierte Bestellungen (älteste zuerst):")
+        sorted_uncanceled_orders = metrics.timed_iter("filter", sorted_uncanceled_orders)
+        expanded_orders = metrics.timed_iter("sku", sku_rules.iter_expand(sorted_uncanceled_orders))
+        processed_orders = metrics.timed_iter("dedup", (order for order in expanded_orders
+                                                        if order.order_id not in excel_order_ids))
+
+        metrics.count("orders", total_orders)
+        metrics.count("order_lines", order_line_count)
+
+        # Statistik-Informationen
+        cancelled_orders = total_orders - uncanceled_orders  # Anzahl der stornierten Bestellungen
+
+        # 计算重复订单（在Excel中已存在的订单）
+        duplicate_orders = len(all_order_ids.intersection(excel_order_ids))
+        # 计算新订单（不在Excel中的订单）
+        new_orders = len(all_order_ids - excel_order_ids)
+
+        # Statistik im GUI-Fenster anzeigen
+        log("\n=== Bestellstatistik ===\n")
+        log(f"Gesamte Bestellungen: {total_orders}\n")
+        log(f"Davon storniert: {cancelled_orders}\n")
+        log(f"Verfügbare Bestellungen: {uncanceled_orders}\n")
+        log(f"Bereits in Excel vorhanden: {duplicate_orders}\n")
+        log(f"Neue Bestellungen: {new_orders}\n")
+        if update_status:
+            log(f"Statusänderungen: {len(status_changes)}\n")
+            for order_id, (rows, status) in status_changes.items():
+                log(f"  {order_id}: {status} (Zeile {', '.join(map(str, rows))})\n")
+        log("=" * 50 + "\n")
+
+        """
+        Vier. Informationen in EXCEL-Datei schreiben
+        1. Excel-Tabelle durchsuchen und Bestellnummern (Spalte H) in einer Menge speichern
+        2. Bestellungen aus der Menge processed_orders_list entfernen, die bereits in der Excel-Tabelle vorhanden sind
+        3. Restliche Bestellungen in Excel-Tabelle schreiben
+        """
     
-    # 计算重复订单（在Excel中已存在的订单）
-    duplicate_orders = len(all_order_ids.intersection(excel_order_ids))
-    # 计算新订单（不在Excel中的订单）
-    new_orders = len(all_order_ids - excel_order_ids)
-
-    # Statistik im GUI-Fenster anzeigen
-    info_text.insert(tk.END, "\n=== Bestellstatistik ===\n")
-    info_text.insert(tk.END, f"Gesamte Bestellungen: {total_orders}\n")
-    info_text.insert(tk.END, f"Davon storniert: {cancelled_orders}\n")
-    info_text.insert(tk.END, f"Verfügbare Bestellungen: {uncanceled_orders}\n")
-    info_text.insert(tk.END, f"Bereits in Excel vorhanden: {duplicate_orders}\n")
-    info_text.insert(tk.END, f"Neue Bestellungen: {new_orders}\n")
-    info_text.insert(tk.END, "=" * 50 + "\n")
-
-    """
-    Vier. Informationen in EXCEL-Datei schreiben
-    1. Excel-Tabelle durchsuchen und Bestellnummern (Spalte H) in einer Menge speichern
-    2. Bestellungen aus der Menge processed_orders_list entfernen, die bereits in der Excel-Tabelle vorhanden sind
-    3. Restliche Bestellungen in Excel-Tabelle schreiben
+        # In processed_orders sind nur die Bestellungen, die noch nicht in Excel sind
+
+        # Verkaufssummen neben dem Ziel öffnen, sie werden erst nach erfolgreichem Schreiben gespeichert.
+        # Addiert werden nur Zeilen, die der Duplikatabgleich als neu erkannt hat; ohne Abgleich gegen die bereits
+        # exportierten Bestellungen würde eine Ausgabe dieselben Bestellungen bei jedem Lauf erneut zählen
+        sales_aggregates = None
+        if aggregates and sink is not None and export_index is None:
+            log("Verkaufssummen sind ohne Abgleich der Ausgabe nicht möglich und werden übersprungen.\n")
+        elif aggregates:
+            try:
+                sales_aggregates = SalesAggregates(output_path or excel_path)
+            except sqlite3.Error as e:
+                log(f"Fehler beim Öffnen der Verkaufssummen: {e}\n")
+
+        # Die Verkaufssummen werden im selben Durchgang wie das Schreiben gebildet, hinter dem Duplikatabgleich
+        if sales_aggregates is not None:
+            processed_orders = metrics.timed_iter("aggregates", sales_aggregates.track(processed_orders))
+
+        def log_write_retry():
+            """Meldet nach einem fehlgeschlagenen Schreiben, dass ein erneuter Lauf nur das Schreiben wiederholt"""
+            if journal is not None:
+                log("Die abgerufenen Bestellungen bleiben im Laufjournal erhalten, ein erneuter Lauf wiederholt das "
+                    "Schreiben, ohne sie erneut abzurufen.\n")
+
+        # Funktion aufrufen, um Bestellungen in die Excel-Datei zu schreiben.
+        # Ohne neue Bestellungen muss die Arbeitsmappe weder vollständig geladen noch gespeichert werden
+        try:
+            if is_cancelled():
+                log("\nVerarbeitung abgebrochen, Excel-Datei unverändert.\n")
+                return finish(False)
+            if sink is not None:
+                # Zeilen direkt aus der Verarbeitungskette in die Ausgabe streamen ("output" enthält nur das Schreiben)
+                # Die exportierten Bestellnummern werden in derselben Transaktion eingetragen, nur wenn das Schreiben gelingt.
+                # Die Ausgabe übernimmt die Zeilen zuletzt (commit); scheitert danach die Transaktion, wird sie zurückgesetzt
+                try:
+                    with metrics.stage("output"), export_index.connection:
+                        written = sink.write(export_index.track(processed_orders))
+                        export_index.record()
+                        sink.commit()
+                except (OSError, sqlite3.Error, KeyError) as e:
+                    sink.rollback()
+                    log(f"\nFehler beim Schreiben nach {output_path}: {e}\n")
+                    log_write_retry()
+                    return finish(False)
+                metrics.count("rows_written", written)
+                log(f"\n{written} Zeilen nach {output_path} geschrieben.")
+                log("\nBestellverarbeitung abgeschlossen!")
+            elif shard_monthly and new_orders:
+                # Die Zeilen werden monatsweise aus der Verarbeitungskette übernommen
+                try:
+                    written = write_orders_to_shards(processed_orders, excel_path, worksheet_name, manifest, metrics)
+                except (OSError, sqlite3.Error) as e:
+                    log(f"\nFehler beim Speichern der Monatsarbeitsmappen: {e}\n")
+                    log_write_retry()
+                    return finish(False)
+                log(f"\n{written} Zeilen in Monatsarbeitsmappen geschrieben.")
+                log("\nBestellverarbeitung abgeschlossen!")
+            elif new_orders or status_changes:
+                # Die Arbeitsmappe liegt beim Schreiben ohnehin vollständig im Speicher, die neuen Zeilen werden daher gesammelt
+                processed_orders_list = list(processed_orders)
+                try:
+                    write_orders_to_excel(processed_orders_list, excel_path, worksheet_name, order_index, metrics,
+                                          status_changes, update_status)
+                except (OSError, sqlite3.Error) as e:
+                    log(f"\nFehler beim Speichern von {excel_path}: {e}\n")
+                    log_write_retry()
+                    return finish(False)
+                log("\nBestellverarbeitung abgeschlossen!")
+            else:
+                log("\nKeine neuen Bestellungen, Excel-Datei unverändert.")
+                log("\nBestellverarbeitung abgeschlossen!")
+            # Neu geschriebene Zeilen zu den Verkaufssummen addieren
+            if sales_aggregates is not None:
+                try:
+                    sales_aggregates.commit()
+                    if aggregates_summary:
+                        summary_path = os.path.splitext(output_path or excel_path)[0] + "_summary.xlsx"
+                        sales_aggregates.write_summary(summary_path)
+                        log(f"\nÜbersicht geschrieben: {summary_path}")
+                except (OSError, sqlite3.Error) as e:
+                    log(f"\nFehler beim Aktualisieren der Verkaufssummen: {e}")
+            # Erst nach erfolgreichem Schreiben ist der Lauf abgeschlossen und das Journal wird geleert
+            if journal is not None:
+                journal.finish()
+        finally:
+            if order_index is not None:
+                order_index.close()
+            if manifest is not None:
+                manifest.close()
+            if export_index is not None:
+                export_index.close()
+            if sales_aggregates is not None:
+                sales_aggregates.close()
+            if journal is not None:
+                journal.close()
+            close_spools()
+
+        # Im inkrementellen Modus den neuen Stand erst speichern, wenn alle Bestellungen abgerufen und geschrieben wurden.
+        # Wurde das Bestelllimit erreicht, fehlen möglicherweise Bestellungen, daher bleibt der alte Stand erhalten
+        if incremental and not order_ids:
+            config = load_config()
+            changed = False
+            # Ohne Backfill gibt es genau einen Auftrag pro Konto
+            for account, watermark, (_, account_orders, _, new_watermark, fetch_complete) in zip(accounts, watermarks, task_results):
+                if not new_watermark or (watermark and new_watermark <= watermark):
+                    continue
+                prefix = f"[{account['name']}] " if account["name"] else ""
+                if fetch_complete and not (orders_limit and account_orders >= orders_limit):
+                    if account["name"]:
+                        config.setdefault(ACCOUNT_WATERMARKS_KEY, {})[account["name"]] = new_watermark
+                    else:
+                        config[WATERMARK_KEY] = new_watermark
+                    changed = True
+                    log(f"\n{prefix}Synchronisiert bis: {new_watermark}")
+                else:
+                    log(f"\n{prefix}Nicht alle Bestellungen wurden abgerufen, der Synchronisierungsstand bleibt unverändert.")
+            if changed:
+                save_config(config)
+        return finish(True)
+    finally:
+        # Auch ein vorzeitig beendeter Lauf (ungültige Eingaben, Ausnahmen) wird mit success=False exportiert,
+        # damit die exportierten Metriken nicht den Erfolg eines früheren Laufs zeigen
+        if metrics.success is None:
+            metrics.success = False
+            try:
+                metrics.export(metrics_json_file, metrics_prometheus_file)
+            except OSError as e:
+                log(f"Fehler beim Exportieren der Metriken: {e}\n")
+
+
+def run_cli(argv):
     """
-    
-    # Bereits in processed_orders_list sind nur die Bestellungen, die noch nicht in Excel sind
+    Kommandozeilenmodus ohne Benutzeroberfläche (z.B. für cron oder systemd).
+    Nicht angegebene Werte werden aus der Konfigurationsdatei übernommen, das Zugriffstoken aus --token,
+    --token-file oder der Umgebungsvariablen EBAY_ACCESS_TOKEN.
+    Mit --watch wird die Synchronisierung im angegebenen Intervall wiederholt. Token und Kontoprofile werden vor jedem
+    Durchgang neu gelesen (Zugriffstoken laufen nach etwa zwei Stunden ab); die Verbindung wird wiederverwendet, bis
+    sich das Token ändert, der Zwischenspeicher über alle Durchgänge. Ein Fehler in einem Durchgang wird gemeldet und
+    beendet den Dienst nicht. SIGINT/SIGTERM beenden den Dienst nach dem laufenden Durchgang.
+    Gibt den Exit-Code zurück (0 = letzter Lauf erfolgreich).
+    """
+    import argparse
+    import signal
+
+    parser = argparse.ArgumentParser(
+        description="eBay Bestellverarbeitung ohne Benutzeroberfläche. Ohne Argumente gestartet, öffnet sich die Benutzeroberfläche.")
+    parser.add_argument("--token", help="eBay-Zugriffstoken (Standard: Umgebungsvariable EBAY_ACCESS_TOKEN)")
+    parser.add_argument("--token-file", help="Datei, die das eBay-Zugriffstoken enthält")
+    parser.add_argument("--account", action="append", metavar="NAME",
+                        help="Nur dieses Kontoprofil aus der Konfiguration verwenden (mehrfach angebbar). "
+                             "Ohne Token werden alle Kontoprofile verwendet")
+    parser.add_argument("--days", type=int, help="Anzahl der Bestellungstage")
+    parser.add_argument("--limit", type=int, help="Maximale Anzahl der Bestellungen (0 = alle)")
+    parser.add_argument("--excel", help="Pfad der Ziel-Excel-Datei")
+    parser.add_argument("--sheet", help="Name des Arbeitsblatts")
+    parser.add_argument("--workers", type=int, help="Anzahl gleichzeitiger getOrder-Anfragen")
+    parser.add_argument("--order-ids", nargs="+", metavar="ORDER_ID", help="Nur diese Bestellungen abrufen")
+    parser.add_argument("--summary-only", action=argparse.BooleanOptionalAction, default=None,
+                        help="Bestelldaten aus der Bestellliste übernehmen und getOrder nur bei fehlenden Feldern aufrufen")
+    parser.add_argument("--incremental", action=argparse.BooleanOptionalAction, default=None,
+                        help="Nur seit der letzten Synchronisierung geänderte Bestellungen abrufen")
+    parser.add_argument("--update-status", action=argparse.BooleanOptionalAction, default=None,
+                        help="Status bereits importierter Bestellungen in Spalte R aktualisieren")
+    parser.add_argument("--shard-monthly", action=argparse.BooleanOptionalAction, default=None,
+                        help="Neue Bestellzeilen nach Erstellungsmonat in Monatsarbeitsmappen schreiben")
+    parser.add_argument("--summary-sheet", action=argparse.BooleanOptionalAction, default=None,
+                        help="Verkaufssummen pro SKU und Tag/Monat in eine Übersichtsarbeitsmappe schreiben")
+    parser.add_argument("--verbose", action=argparse.BooleanOptionalAction, default=None,
+                        help="Bestelllisten vollständig auf der Konsole ausgeben")
+    parser.add_argument("--no-cache", action="store_true", default=None, help="Zwischenspeicher für Bestelldetails umgehen")
+    parser.add_argument("--output", metavar="FILE",
+                        help="Neue Bestellzeilen statt in die Arbeitsmappe in diese Datei schreiben (.csv, .sqlite/.db oder neue .xlsx)")
+    parser.add_argument("--backfill", type=int, metavar="DAYS",
+                        help="Zeitraum in Zeitfenster dieser Länge (Tage) aufteilen und gleichzeitig abrufen")
+    parser.add_argument("--backfill-parallel", type=int, metavar="N",
+                        help=f"Gleichzeitig abgerufene Zeitfenster pro Konto (Standard: {DEFAULT_BACKFILL_PARALLEL})")
+    parser.add_argument("--metrics-json", metavar="FILE", help="Laufzeitmessung als JSON in diese Datei schreiben")
+    parser.add_argument("--metrics-prometheus", metavar="FILE",
+                        help="Laufzeitmessung als Prometheus-Textfile in diese Datei schreiben")
+    parser.add_argument("--watch", type=float, metavar="SECONDS",
+                        help="Synchronisierung in diesem Intervall (Sekunden) wiederholen, bis der Prozess beendet wird")
+    args = parser.parse_args(argv)
 
-    # Funktion zum Schreiben in die Excel-Datei definieren
-    def write_orders_to_excel(orders_list, file_path):  # Eingabeparameter: Bestellliste und Excel-Dateipfad
-        # Excel-Datei öffnen
-        workbook = openpyxl.load_workbook(file_path)
+    config = load_config()
 
-        # Arbeitsblatt mit dem angegebenen Namen auswählen
-        sheet = workbook[worksheet_name]  # Direkter Zugriff auf das Arbeitsblatt, um DeprecationWarning zu vermeiden
+    def read_token():
+        """Ermittelt das Zugriffstoken (im Dienstmodus vor jedem Durchgang, damit ein erneuertes Token übernommen wird)"""
+        token = args.token or os.environ.get("EBAY_ACCESS_TOKEN", "")
+        if args.token_file:
+            with open(args.token_file, 'r', encoding='utf-8') as f:
+                token = f.read()
+        return token.strip()
+
+    token = read_token()
+    accounts = load_accounts(config, args.account) if args.account or not token else None
+
+    days = str(args.days) if args.days is not None else str(config.get("days", ""))
+    orders_limit = str(args.limit) if args.limit is not None else str(config.get("orders_limit", ""))
+    excel_path = args.excel or config.get("excel_path", "")
+    worksheet_name = args.sheet or config.get("worksheet_name", "")
+    max_workers = args.workers or config_number(config, "max_workers", DEFAULT_MAX_WORKERS)
+    requests_per_second = config_number(config, "requests_per_second", DEFAULT_REQUESTS_PER_SECOND, float)
+    max_retries = config_number(config, "max_retries", DEFAULT_MAX_RETRIES)
+    cache_ttl_hours = config_number(config, "cache_ttl_hours", DEFAULT_CACHE_TTL_HOURS, float)
+    cache_max_mb = config_number(config, "cache_max_mb", DEFAULT_CACHE_MAX_MB, float)
+    use_cache = not (config.get("bypass_cache", False) if args.no_cache is None else args.no_cache)
+    backfill_parallel = args.backfill_parallel or config_number(config, "backfill_parallel", DEFAULT_BACKFILL_PARALLEL)
+    # Gleichzeitig abgerufene Zeitfenster, nach denen sich der Verbindungspool der wiederverwendeten Verbindung richtet
+    parallel_per_account = max(1, backfill_parallel) if args.backfill else 1
+
+    # SIGINT/SIGTERM beenden die Verarbeitung geordnet: der laufende Durchgang wird abgebrochen, ohne die Excel-Datei zu verändern
+    cancel_event = threading.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signal_number, lambda signum, frame: cancel_event.set())
+
+    # SKU-Regeln einmal laden, damit der Zwischenspeicher pro SKU über alle Durchgänge erhalten bleibt
+    sku_rules = SkuRules(load_sku_rules())
+
+    # Im Dienstmodus den Zwischenspeicher einmal erstellen und für alle Durchgänge verwenden, die Verbindung wird im
+    # Durchgang erstellt und bis zu einem neuen Token wiederverwendet (bei Kontoprofilen erstellt process_orders die
+    # Verbindungen pro Durchgang)
+    session = cache = None
+    session_token = None
+    success = False
+    if args.watch:
+        try:
+            cache = ResponseCache(get_response_cache_path(), cache_ttl_hours * 3600, cache_max_mb * 1024 * 1024,
+                                  read=use_cache)
+        except sqlite3.Error as e:
+            print(f"Fehler beim Öffnen des Zwischenspeichers: {e}")
 
-        # Nächste leere Zeile in Spalte A finden, um mit dem Schreiben zu beginnen
-        next_row = 1
-        while sheet.cell(row=next_row, column=1).value:
-            next_row += 1
-
-        # Bestellliste durchlaufen und Daten schreiben
-        for order in orders_list:
-            # Bestellinformationen in Excel schreiben
-            sheet.cell(row=next_row, column=1).value = order['creationDate']  # Bestelldatum
-            sheet.cell(row=next_row, column=2).value = 'Ebay'  # Plattform
-            sheet.cell(row=next_row, column=3).value = order['quantity']  # Menge
-            sheet.cell(row=next_row, column=4).value = order['price']  # Preis
-            sheet.cell(row=next_row, column=5).value = order['sku']  # Artikelnummer
-            sheet.cell(row=next_row, column=6).value = 'Wuppertal'  # Standort
-            sheet.cell(row=next_row, column=7).value = 'Ebay'  # Verkaufsplattform
-            sheet.cell(row=next_row, column=8).value = order['order_id']  # Bestellnummer
-            sheet.cell(row=next_row, column=10).value = order['buyer_username']  # Käufername
-            sheet.cell(row=next_row, column=11).value = order['email']  # E-Mail-Adresse
-            sheet.cell(row=next_row, column=12).value = order['phone_number']  # Telefonnummer
-            sheet.cell(row=next_row, column=13).value = 'Versand'  # Versand
-            sheet.cell(row=next_row, column=14).value = order['full_name']  # Empfängername
-            sheet.cell(row=next_row, column=15).value = order['Strasse']  # Straße
-            sheet.cell(row=next_row, column=16).value = order['PLZ']  # Postleitzahl
-            sheet.cell(row=next_row, column=17).value = order['city']  # Stadt
-            # Neue Zeile einfügen
-            sheet.insert_rows(next_row + 1)
-            next_row += 1  # Zur nächsten Zeile wechseln
-
-            # Zeilennummer der soeben geschriebenen Datumszelle abrufen
-            date_row = next_row - 1
-
-            # Textwert des soeben geschriebenen Datums in ein Datumsobjekt umwandeln und in das Format TT.MM.JJJJ ändern
-            date_column = 1  # Spalte des Datums
-            date_cell = sheet.cell(row=date_row, column=date_column)
-            date_cell.value = datetime.strptime(str(date_cell.value), "%Y-%m-%d")
-            date_cell.number_format = "DD.MM.YY"
-
-        # Excel-Datei speichern
-        workbook.save(file_path)
-        info_text.insert(tk.END, f"\nBestellverarbeitung abgeschlossen!")
-
-    # Funktion aufrufen, um Bestellungen in die Excel-Datei zu schreiben
-    write_orders_to_excel(processed_orders_list, excel_path)
+    try:
+        while True:
+            if args.watch:
+                # Token und Kontoprofile neu lesen, bei einem neuen Token die Verbindung neu aufbauen
+                try:
+                    token = read_token()
+                    accounts = load_accounts(load_config(), args.account) if args.account or not token else None
+                except OSError as e:
+                    print(f"Fehler beim Lesen des Zugriffstokens: {e}")
+                if accounts is None and token != session_token:
+                    if session is not None:
+                        session.close()
+                    session = ApiSession(token, max_workers * parallel_per_account, requests_per_second, max_retries,
+                                         list_streams=parallel_per_account)
+                    session_token = token
+            try:
+                success = process_orders(
+                    token, days, orders_limit, excel_path, worksheet_name, str(max_workers),
+                    requests_per_second=requests_per_second,
+                    max_retries=max_retries,
+                    session=session,
+                    summary_only=config.get("summary_only", False) if args.summary_only is None else args.summary_only,
+                    order_ids=args.order_ids,
+                    use_order_index=bool(config.get("order_index", True)),
+                    incremental=config.get("incremental", False) if args.incremental is None else args.incremental,
+                    watermark_overlap_minutes=config_number(config, "watermark_overlap_minutes", DEFAULT_WATERMARK_OVERLAP_MINUTES),
+                    use_cache=use_cache,
+                    cache_ttl_hours=cache_ttl_hours,
+                    cache_max_mb=cache_max_mb,
+                    cancel_event=cancel_event,
+                    cache=cache,
+                    sku_rules=sku_rules,
+                    metrics_json_file=args.metrics_json or config.get("metrics_json_file"),
+                    metrics_prometheus_file=args.metrics_prometheus or config.get("metrics_prometheus_file"),
+                    accounts=accounts,
+                    output_path=args.output or config.get("output_path"),
+                    backfill_window_days=args.backfill or 0,
+                    backfill_parallel=backfill_parallel,
+                    use_journal=bool(config.get("run_journal", True)),
+                    journal_max_age_hours=config_number(config, "journal_max_age_hours", DEFAULT_JOURNAL_MAX_AGE_HOURS, float),
+                    update_status=config.get("update_status", False) if args.update_status is None else args.update_status,
+                    shard_monthly=config.get("shard_monthly", False) if args.shard_monthly is None else args.shard_monthly,
+                    aggregates=bool(config.get("aggregates", True)),
+                    aggregates_summary=config.get("aggregates_summary", False) if args.summary_sheet is None else args.summary_sheet,
+                    sort_buffer_lines=config_number(config, "sort_buffer_lines", DEFAULT_SORT_BUFFER_LINES),
+                    verbose=config.get("verbose_console", False) if args.verbose is None else args.verbose,
+                )
+            except Exception as e:
+                # Im Dienstmodus beendet ein Fehler (z.B. gesperrte Arbeitsmappe) nur den Durchgang, nicht den Dienst
+                if not args.watch:
+                    raise
+                print(f"Fehler im Durchgang: {e!r}")
+                success = False
+            print()
+            if not args.watch or cancel_event.is_set():
+                break
+            print(f"Nächste Synchronisierung in {args.watch:g} Sekunden...")
+            if cancel_event.wait(args.watch):
+                break
+    finally:
+        if session is not None:
+            session.close()
+        if cache is not None:
+            cache.close()
+    return 0 if success else 1
 
 
 if __name__ == "__main__":
+    # Mit Argumenten im Kommandozeilenmodus starten, sonst die Benutzeroberfläche öffnen
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
     main()
 
 